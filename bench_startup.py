@@ -0,0 +1,92 @@
+"""
+Бенчмарк холодного старта.
+
+Измеряет:
+- время импорта модулей (каждый в отдельном свежем интерпретаторе);
+- время до первого обслуженного запроса (GET /health) после запуска main.py;
+- время до готовности зависимостей (GET /ready).
+
+Запуск:
+> python bench_startup.py [--runs 5]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+import requests
+
+MODULES = ["url_manager", "functions", "main"]
+HEALTH_URL = "http://localhost:5000/health"
+READY_URL = "http://localhost:5000/ready"
+SERVER_TIMEOUT = 60
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - t)"
+)
+
+def measure_import(module: str) -> float:
+    """Время импорта модуля в свежем интерпретаторе, сек"""
+    output = subprocess.check_output(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+        stderr=subprocess.DEVNULL
+    )
+    return float(output.decode().strip().splitlines()[-1])
+
+def _wait_for(url: str, start: float, process, accept_status=(200,)):
+    while time.perf_counter() - start < SERVER_TIMEOUT and process.poll() is None:
+        try:
+            if requests.get(url, timeout=1).status_code in accept_status:
+                return time.perf_counter() - start
+        except requests.RequestException:
+            pass
+        time.sleep(0.01)
+    return None
+
+def measure_server_start():
+    """Время до первого ответа /health и до готовности /ready, сек"""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "main.py"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        first_request = _wait_for(HEALTH_URL, start, process)
+        ready = _wait_for(READY_URL, start, process)
+    finally:
+        process.terminate()
+        process.wait()
+    return first_request, ready
+
+def _format(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return "—"
+    return f"median {statistics.median(values) * 1000:.0f} ms, min {min(values) * 1000:.0f} ms"
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк холодного старта")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print("⏱️ Время импорта")
+    for module in MODULES:
+        try:
+            timings = [measure_import(module) for _ in range(args.runs)]
+            print(f"  {module:<12} {_format(timings)}")
+        except subprocess.CalledProcessError:
+            print(f"  {module:<12} ошибка импорта")
+
+    print("⏱️ Запуск сервера")
+    first_requests, readies = [], []
+    for _ in range(args.runs):
+        first_request, ready = measure_server_start()
+        first_requests.append(first_request)
+        readies.append(ready)
+    print(f"  первый запрос  {_format(first_requests)}")
+    print(f"  /ready         {_format(readies)}")
+
+if __name__ == "__main__":
+    main()
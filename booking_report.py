@@ -0,0 +1,234 @@
+import os
+import re
+import csv
+import sys
+import queue
+import argparse
+import threading
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ['Имя', 'Телефон', 'Услуга', 'Дата и время', 'Мастер', 'Комментарий']
+SHEET_NAME = 'Лист1'
+PAGE_SIZE = 500
+QUEUE_PAGES = 4  # сколько страниц может ждать записи: ограничивает память конвейера
+NO_DATE = 'без даты'
+
+DATE_FORMATS = ['%d.%m.%Y %H:%M', '%d.%m.%Y', '%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d']
+DATE_RE = re.compile(r'\d{1,4}[.\-]\d{1,2}[.\-]\d{2,4}(?:\s+\d{1,2}:\d{2}(?::\d{2})?)?')
+
+
+# ==============================
+# ЧТЕНИЕ (постранично)
+# ==============================
+
+def _normalize_row(row: list) -> list:
+    row = [str(value) for value in row[:len(COLUMNS)]]
+    row += [''] * (len(COLUMNS) - len(row))
+    # Телефон сохраняется с апострофом, чтобы Sheets не съедал "+"
+    row[1] = row[1].lstrip("'")
+    return row
+
+
+def iter_sheet_pages(spreadsheet_id: str, page_size: int = PAGE_SIZE):
+    """Страницы строк из Google Sheets: по page_size строк за запрос"""
+    # Только клиент Sheets, без импорта functions (OpenAI, планировщик, чекпоинты бота)
+    from sheets_pool import SheetsClientPool
+    pool = SheetsClientPool.from_service_account_file(
+        os.getenv('GOOGLE_SHEETS_CREDENTIALS_FILE', 'credentials.json')
+    )
+    start = 1
+    while True:
+        end = start + page_size - 1
+        result = pool.values().get(
+            spreadsheetId=spreadsheet_id,
+            range=f"{SHEET_NAME}!A{start}:F{end}"
+        ).execute()
+        rows = result.get('values', [])
+        fetched = len(rows)
+        if start == 1 and rows and rows[0] and rows[0][0] == COLUMNS[0]:
+            rows = rows[1:]
+        if rows:
+            yield [_normalize_row(row) for row in rows]
+        if fetched < page_size:
+            return
+        start = end + 1
+
+
+def iter_csv_pages(path: str, page_size: int = PAGE_SIZE):
+    """Страницы строк из локальной CSV-выгрузки таблицы"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        page = []
+        for row in csv.reader(f):
+            if not row or row[0] == COLUMNS[0]:
+                continue
+            page.append(_normalize_row(row))
+            if len(page) >= page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+
+
+def pipelined(pages):
+    """
+    Читает страницы в отдельном потоке, пока основной поток пишет отчёт.
+    Очередь ограничена QUEUE_PAGES страницами, поэтому память не растёт
+    с размером таблицы.
+    """
+    buffer = queue.Queue(maxsize=QUEUE_PAGES)
+    done = object()
+    errors = []
+
+    def reader():
+        try:
+            for page in pages:
+                buffer.put(page)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            buffer.put(done)
+
+    threading.Thread(target=reader, name="report-reader", daemon=True).start()
+    while True:
+        page = buffer.get()
+        if page is done:
+            break
+        yield from page
+    if errors:
+        raise errors[0]
+
+
+# ==============================
+# ЗАПИСЬ
+# ==============================
+
+def parse_booking_date(value: str):
+    match = DATE_RE.search(value or '')
+    if not match:
+        return None
+    text = match.group(0)
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format)
+        except ValueError:
+            continue
+    return None
+
+
+def period_key(value: str, period: str) -> str:
+    """День (ГГГГ-ММ-ДД) или неделя (понедельник ГГГГ-ММ-ДД) записи"""
+    booking_date = parse_booking_date(value)
+    if booking_date is None:
+        return NO_DATE
+    if period == 'week':
+        booking_date -= timedelta(days=booking_date.weekday())
+        return f"неделя с {booking_date:%Y-%m-%d}"
+    return f"{booking_date:%Y-%m-%d}"
+
+
+def write_csv(rows, output: str) -> int:
+    count = 0
+    with open(output, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def summarize(rows, period: str) -> Counter:
+    """Количество записей по (период, услуга, категория мастера)"""
+    summary = Counter()
+    for row in rows:
+        service = row[2].strip() or 'не указана'
+        master = row[4].strip() or 'не указана'
+        summary[(period_key(row[3], period), service, master)] += 1
+    return summary
+
+
+def _sorted_groups(summary: Counter):
+    return sorted(summary.items(), key=lambda item: (item[0][0] == NO_DATE, item[0]))
+
+
+def write_docx(summary: Counter, output: str, period: str):
+    from docx import Document
+    doc = Document()
+    doc.add_heading(f"Отчёт по записям ({'по неделям' if period == 'week' else 'по дням'})", 0)
+    current_period = None
+    table = None
+    for (period_name, service, master), count in _sorted_groups(summary):
+        if period_name != current_period:
+            current_period = period_name
+            doc.add_heading(period_name, 1)
+            table = doc.add_table(rows=1, cols=3)
+            table.style = 'Table Grid'
+            header = table.rows[0].cells
+            header[0].text, header[1].text, header[2].text = 'Услуга', 'Мастер', 'Записей'
+        cells = table.add_row().cells
+        cells[0].text, cells[1].text, cells[2].text = service, master, str(count)
+    doc.add_paragraph(f"Всего записей: {sum(summary.values())}")
+    doc.save(output)
+
+
+def write_xlsx(summary: Counter, output: str, period: str):
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Неделя' if period == 'week' else 'День')
+    sheet.append(['Период', 'Услуга', 'Мастер', 'Записей'])
+    for (period_name, service, master), count in _sorted_groups(summary):
+        sheet.append([period_name, service, master, count])
+    workbook.save(output)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Отчёт по записям из Google Sheets или локальной выгрузки")
+    parser.add_argument('--source', choices=['sheet', 'csv'], default='sheet')
+    parser.add_argument('--input', help='CSV-выгрузка таблицы (для --source csv)')
+    parser.add_argument('--format', choices=['csv', 'docx', 'xlsx'], default='csv')
+    parser.add_argument('--period', choices=['day', 'week'], default='day',
+                        help='группировка сводки (docx/xlsx)')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    parser.add_argument('-o', '--output', required=True)
+    args = parser.parse_args()
+    load_dotenv()
+
+    # Необязательные зависимости проверяем до чтения таблицы
+    optional_module = {'docx': 'docx', 'xlsx': 'openpyxl'}.get(args.format)
+    if optional_module:
+        try:
+            __import__(optional_module)
+        except ImportError:
+            logger.error(f"Для формата {args.format} нужна библиотека {optional_module}")
+            return 1
+
+    if args.source == 'csv':
+        if not args.input:
+            parser.error('--input обязателен для --source csv')
+        pages = iter_csv_pages(args.input, args.page_size)
+    else:
+        spreadsheet_id = os.getenv('GOOGLE_SHEET_ID')
+        if not spreadsheet_id:
+            parser.error('GOOGLE_SHEET_ID не найден в переменных окружения')
+        pages = iter_sheet_pages(spreadsheet_id, args.page_size)
+
+    rows = pipelined(pages)
+    if args.format == 'csv':
+        count = write_csv(rows, args.output)
+    else:
+        summary = summarize(rows, args.period)
+        count = sum(summary.values())
+        writer = write_docx if args.format == 'docx' else write_xlsx
+        writer(summary, args.output, args.period)
+    logger.info(f"Отчёт сохранён в {args.output}: {count} записей")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import time
+import threading
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker для внешнего API.
+    Размыкается, когда в скользящем окне последних вызовов доля ошибок
+    или доля медленных вызовов превышает порог. Через open_seconds
+    переходит в half-open и пропускает пробные вызовы: успех замыкает
+    цепь, ошибка или медленный ответ снова размыкают.
+    """
+
+    def __init__(self, name: str, window_size: int = 20, min_calls: int = 5,
+                 failure_rate_threshold: float = 0.5, slow_call_seconds: float = 15.0,
+                 slow_call_rate_threshold: float = 0.5, open_seconds: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = None
+        self._half_open_calls = 0
+        # (ok: bool, slow: bool) последних вызовов
+        self._window = deque(maxlen=window_size)
+        self._rejected = 0
+        self._times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._half_open_calls = 0
+            logger.info(f"Circuit breaker {self.name}: half-open, пропускаем пробный вызов")
+
+    def _open(self, reason: str):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._times_opened += 1
+        logger.warning(f"Circuit breaker {self.name}: OPEN ({reason})")
+
+    def _close(self):
+        self._state = CLOSED
+        self._window.clear()
+        logger.info(f"Circuit breaker {self.name}: closed")
+
+    def allow_request(self) -> bool:
+        """Можно ли выполнить вызов. При False вызов нужно сразу заменить фолбэком"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            self._rejected += 1
+            return False
+
+    def _record(self, ok: bool, duration: float = None):
+        slow = duration is not None and duration >= self.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if ok and not slow:
+                    self._close()
+                else:
+                    self._open("пробный вызов неуспешен" if not ok else f"пробный вызов {duration:.1f} сек")
+                return
+            if self._state == OPEN:
+                return
+            self._window.append((ok, slow))
+            if len(self._window) < self.min_calls:
+                return
+            failure_rate = sum(1 for ok_, _ in self._window if not ok_) / len(self._window)
+            slow_rate = sum(1 for _, slow_ in self._window if slow_) / len(self._window)
+            if failure_rate >= self.failure_rate_threshold:
+                self._open(f"доля ошибок {failure_rate:.0%}")
+            elif slow_rate >= self.slow_call_rate_threshold:
+                self._open(f"доля медленных вызовов {slow_rate:.0%}")
+
+    def record_success(self, duration: float = None):
+        self._record(True, duration)
+
+    def record_failure(self, duration: float = None):
+        self._record(False, duration)
+
+    def snapshot(self) -> dict:
+        """Состояние для мониторинга"""
+        with self._lock:
+            self._maybe_half_open()
+            calls = len(self._window)
+            failures = sum(1 for ok, _ in self._window if not ok)
+            slow = sum(1 for _, slow_ in self._window if slow_)
+            return {
+                "name": self.name,
+                "state": self._state,
+                "window_calls": calls,
+                "failure_rate": round(failures / calls, 3) if calls else 0.0,
+                "slow_call_rate": round(slow / calls, 3) if calls else 0.0,
+                "open_for_seconds": round(time.monotonic() - self._opened_at, 1) if self._state == OPEN else None,
+                "times_opened": self._times_opened,
+                "rejected_calls": self._rejected
+            }
@@ -1,12 +1,26 @@
 import os
+import json
 import requests
 from dotenv import load_dotenv
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+import threading
 import time
 import logging
-from openai import OpenAI
+from circuit_breaker import CircuitBreaker
+from knowledge_index import KnowledgeIndex
+from tracing import span
+from usage_tracker import usage_tracker
+from model_router import model_router, BUDGET
+from slot_parser import parse_phone, normalize_datetime, validate_booking, extract_slots
+from run_checkpoints import run_checkpoints
+from scheduler import scheduler
+from sheets_pool import SheetsClientPool
+from janitor import ThreadJanitor
+
+# openai, google.oauth2 и googleapiclient импортируются лениво внутри
+# initialize_openai/initialize_sheets: импорт functions.py должен быть дешёвым
 
 # Настройка логирования
 logging.basicConfig(
@@ -25,6 +39,7 @@ def initialize_openai():
     """Инициализация OpenAI Assistant API"""
     global openai_client
     try:
+        from openai import OpenAI
         api_key = os.getenv('OPENAI_API_KEY')
         if not api_key:
             raise ValueError("OPENAI_API_KEY не найден в переменных окружения")
@@ -47,41 +62,376 @@ def initialize_openai():
         return False
 
 # --- ИНИЦИАЛИЗАЦИЯ GOOGLE SHEETS ---
-sheets_service = None
+# Клиенты Sheets по одному на поток (см. sheets_pool.py); None - API не инициализирован
+sheets_pool = None
 
 def initialize_sheets():
     """Инициализация Google Sheets API"""
-    global sheets_service
+    global sheets_pool
     try:
         credentials_path = os.getenv('GOOGLE_SHEETS_CREDENTIALS_FILE', 'credentials.json')
-        if not os.path.exists(credentials_path):
-            raise FileNotFoundError(f"Файл учетных данных Google Sheets не найден: {credentials_path}")
-        scopes = ['https://www.googleapis.com/auth/spreadsheets']
-        creds = service_account.Credentials.from_service_account_file(
-            credentials_path, scopes=scopes
-        )
-        sheets_service = build('sheets', 'v4', credentials=creds)
+        pool = SheetsClientPool.from_service_account_file(credentials_path)
+        pool.service()  # клиент потока инициализации: проверка discovery-документа
+        sheets_pool = pool
         logger.info("Google Sheets API успешно инициализирован")
         return True
     except Exception as e:
         logger.error(f"Ошибка при инициализации Google Sheets: {str(e)}")
-        sheets_service = None
+        sheets_pool = None
         return False
 
-# Вызываем инициализацию при импорте
-initialize_openai()
-initialize_sheets()
-
 # --- ИНИЦИАЛИЗАЦИЯ TELEGRAM ---
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_GROUP_ID = os.getenv('TELEGRAM_GROUP_ID')
 TELEGRAM_API_URL = f'https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}'
 
+def initialize_telegram():
+    """Проверка токена Telegram-бота через getMe"""
+    try:
+        if not TELEGRAM_BOT_TOKEN:
+            raise ValueError("TELEGRAM_BOT_TOKEN не найден в переменных окружения")
+        response = requests.get(f"{TELEGRAM_API_URL}/getMe", timeout=10).json()
+        if not response.get("ok", False):
+            raise RuntimeError(f"Telegram API error: {response}")
+        logger.info(f"Telegram бот найден: @{response['result'].get('username')}")
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка при инициализации Telegram: {str(e)}")
+        return False
+
+# --- ПАРАЛЛЕЛЬНАЯ ИНИЦИАЛИЗАЦИЯ ЗАВИСИМОСТЕЙ ---
+DEPENDENCY_INITIALIZERS = {
+    'openai': initialize_openai,
+    'sheets': initialize_sheets,
+    'telegram': initialize_telegram,
+}
+
+# name -> {"state": "pending"/"ready"/"failed", "seconds": float}
+dependency_status = {name: {'state': 'pending', 'seconds': None} for name in DEPENDENCY_INITIALIZERS}
+
+def _run_initializer(name: str):
+    start_time = time.perf_counter()
+    try:
+        ok = DEPENDENCY_INITIALIZERS[name]()
+    except Exception as e:
+        logger.error(f"Ошибка при инициализации {name}: {str(e)}")
+        ok = False
+    dependency_status[name] = {
+        'state': 'ready' if ok else 'failed',
+        'seconds': round(time.perf_counter() - start_time, 3)
+    }
+    return ok
+
+# --- ЛОКАЛЬНЫЙ ИНДЕКС БАЗЫ ЗНАНИЙ ---
+KNOWLEDGE_INDEX_FILE = os.getenv('KNOWLEDGE_INDEX_FILE', 'knowledge_index.json')
+KNOWLEDGE_TOP_K = int(os.getenv('KNOWLEDGE_TOP_K', '3'))
+KNOWLEDGE_MIN_SCORE = float(os.getenv('KNOWLEDGE_MIN_SCORE', '1.0'))
+# Если найдены фрагменты базы знаний, run запускается без file_search
+KNOWLEDGE_DISABLE_FILE_SEARCH = os.getenv('KNOWLEDGE_DISABLE_FILE_SEARCH', '1') == '1'
+BOOKING_FUNCTION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'save_booking_data.txt')
+
+knowledge_index = None
+_function_tools = None  # tools для run без file_search: только save_booking_data
+
+def initialize_knowledge():
+    """Загрузка офлайн-индекса базы знаний (необязательно)"""
+    global knowledge_index, _function_tools
+    if not os.path.exists(KNOWLEDGE_INDEX_FILE):
+        logger.info(f"Индекс базы знаний {KNOWLEDGE_INDEX_FILE} не найден, используется только file_search")
+        return False
+    try:
+        knowledge_index = KnowledgeIndex.load(KNOWLEDGE_INDEX_FILE)
+        with open(BOOKING_FUNCTION_FILE, 'r', encoding='utf-8') as f:
+            _function_tools = [{'type': 'function', 'function': json.load(f)}]
+        logger.info(f"Индекс базы знаний загружен: {len(knowledge_index.docs)} документов")
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка при загрузке индекса базы знаний: {str(e)}")
+        knowledge_index = None
+        return False
+
+def prepare_assistant_request(message: str):
+    """
+    Подбирает по локальному индексу материалы к вопросу.
+    Возвращает (direct_answer, run_options):
+    direct_answer - готовый ответ FAQ (ассистент не нужен),
+    run_options - дополнительные параметры runs.create.
+    Найденные фрагменты передаются только в этот run (additional_instructions),
+    а не в сообщение треда: иначе они повторно отправлялись бы в каждом
+    следующем run вместе с историей.
+    """
+    if knowledge_index is None:
+        return None, {}
+    direct_answer = knowledge_index.direct_answer(message)
+    if direct_answer:
+        logger.info("Ответ найден в локальной базе знаний")
+        return direct_answer, {}
+    passages = knowledge_index.passages(message, k=KNOWLEDGE_TOP_K, min_score=KNOWLEDGE_MIN_SCORE)
+    if not passages:
+        return None, {}
+    run_options = {
+        'additional_instructions': "Справочная информация клуба для ответа на последний вопрос клиента:\n\n"
+                                   + "\n\n".join(passages)
+    }
+    if KNOWLEDGE_DISABLE_FILE_SEARCH:
+        run_options['tools'] = _function_tools
+    return None, run_options
+
+def initialize_dependencies() -> dict:
+    """
+    Инициализирует OpenAI, Google Sheets и Telegram параллельно.
+    Возвращает dependency_status со временем готовности каждой зависимости.
+    """
+    for name in DEPENDENCY_INITIALIZERS:
+        dependency_status[name] = {'state': 'pending', 'seconds': None}
+    initialize_knowledge()
+    with ThreadPoolExecutor(max_workers=len(DEPENDENCY_INITIALIZERS)) as executor:
+        list(executor.map(_run_initializer, DEPENDENCY_INITIALIZERS))
+    return dependency_status
+
+def dependencies_ready() -> bool:
+    """True, если все зависимости успешно инициализированы"""
+    return all(status['state'] == 'ready' for status in dependency_status.values())
+
 # --- ХРАНЕНИЕ THREAD_ID ДЛЯ КАЖДОГО ПОЛЬЗОВАТЕЛЯ ---
 user_threads = {}  # user_id (str/int) -> thread_id (str)
 web_threads = {}  # Сохраняем thread_id для веб-пользователей
 web_message_counts = {}  # Счетчик сообщений для каждого thread
 
+THREAD_DELETE_TIMEOUT = 10  # сек на threads.delete
+
+def _delete_openai_thread(thread_id: str):
+    from openai import NotFoundError
+    try:
+        with span("openai.threads.delete"):
+            openai_client.beta.threads.delete(thread_id, timeout=THREAD_DELETE_TIMEOUT)
+    except NotFoundError:
+        pass  # уже удалён
+
+# Уборка простаивающих и брошенных тредов (запускается из main после инициализации)
+thread_janitor = ThreadJanitor(_delete_openai_thread, run_checkpoints.active_threads)
+thread_janitor.add_thread_map('telegram', user_threads)
+thread_janitor.add_thread_map('web', web_threads, web_message_counts)
+
+# --- CIRCUIT BREAKER ДЛЯ OPENAI ---
+openai_breaker = CircuitBreaker(
+    'openai',
+    window_size=int(os.getenv('OPENAI_BREAKER_WINDOW', '20')),
+    min_calls=int(os.getenv('OPENAI_BREAKER_MIN_CALLS', '5')),
+    failure_rate_threshold=float(os.getenv('OPENAI_BREAKER_FAILURE_RATE', '0.5')),
+    slow_call_seconds=float(os.getenv('OPENAI_BREAKER_SLOW_SECONDS', '15')),
+    slow_call_rate_threshold=float(os.getenv('OPENAI_BREAKER_SLOW_RATE', '0.5')),
+    open_seconds=float(os.getenv('OPENAI_BREAKER_OPEN_SECONDS', '30'))
+)
+
+BREAKER_FALLBACK_REPLY = (
+    "Консультант сейчас перегружен и не может ответить. "
+    "Вы можете оставить заявку через «Быстрая запись» — администратор свяжется с вами, "
+    "или задайте вопрос чуть позже."
+)
+
+# Последние успешные ответы: отдаются, пока circuit breaker разомкнут.
+# Кэш общий для всех пользователей, поэтому в него попадают только ответы на
+# самостоятельные вопросы из run'ов без вызова функций (см. remember_answer)
+ANSWER_CACHE_SIZE = 200
+MIN_CACHED_QUESTION_WORDS = 3
+_answer_cache = OrderedDict()  # нормализованный вопрос -> ответ
+_answer_cache_lock = threading.Lock()
+
+# --- ДЕДЛАЙНЫ ЗАПРОСОВ К OPENAI ---
+OPENAI_DEADLINE_SECONDS = float(os.getenv('OPENAI_DEADLINE_SECONDS', '30'))
+RUN_CANCEL_TIMEOUT = 5  # секунд на runs.cancel, когда дедлайн уже истёк
+
+deadline_stats = {'misses': 0, 'cancelled_runs': 0, 'cancel_failures': 0}
+_deadline_stats_lock = threading.Lock()
+
+class Deadline:
+    """
+    Абсолютный дедлайн обработки одного сообщения.
+    Передаётся во все вызовы OpenAI: timeout каждого HTTP-запроса
+    не превышает остаток времени.
+    """
+    def __init__(self, seconds: float = None):
+        self.seconds = OPENAI_DEADLINE_SECONDS if seconds is None else seconds
+        self.expires_at = time.monotonic() + self.seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self) -> float:
+        """timeout для очередного вызова OpenAI"""
+        return max(self.remaining(), 0.1)
+
+def _count_deadline_stat(key: str):
+    with _deadline_stats_lock:
+        deadline_stats[key] += 1
+
+def cancel_run(thread_id: str, run_id: str):
+    """Отменяет run на стороне OpenAI, чтобы он не продолжал работать и тарифицироваться"""
+    try:
+        with span("openai.runs.cancel"):
+            openai_client.beta.threads.runs.cancel(
+                thread_id=thread_id,
+                run_id=run_id,
+                timeout=RUN_CANCEL_TIMEOUT
+            )
+        _count_deadline_stat('cancelled_runs')
+        logger.info(f"Run {run_id} cancelled")
+    except Exception as e:
+        _count_deadline_stat('cancel_failures')
+        logger.error(f"Failed to cancel run {run_id}: {e}")
+
+class AssistantRunError(Exception):
+    """Run ассистента завершился неуспешно; user_message - текст для пользователя"""
+    def __init__(self, user_message: str):
+        super().__init__(user_message)
+        self.user_message = user_message
+
+def _normalize_question(message: str) -> str:
+    return ' '.join(message.lower().split())
+
+def _is_standalone_question(message: str) -> bool:
+    """
+    Вопрос, понятный без контекста диалога: "Во сколько вы открываетесь?".
+    Реплики вроде "да", "2", "спасибо" и ответы с телефоном или датой - нет
+    """
+    text = _normalize_question(message)
+    return ('?' in text and len(text.split()) >= MIN_CACHED_QUESTION_WORDS
+            and not extract_slots(text))
+
+def remember_answer(message: str, answer: str):
+    """Кладёт успешный ответ в кэш для фолбэка"""
+    if not _is_standalone_question(message):
+        return
+    with _answer_cache_lock:
+        key = _normalize_question(message)
+        _answer_cache[key] = answer
+        _answer_cache.move_to_end(key)
+        while len(_answer_cache) > ANSWER_CACHE_SIZE:
+            _answer_cache.popitem(last=False)
+
+def assistant_fallback_reply(message: str) -> str:
+    """Быстрый ответ, пока OpenAI недоступен: кэшированный ответ или предложение записи"""
+    with _answer_cache_lock:
+        cached = _answer_cache.get(_normalize_question(message))
+    if cached:
+        logger.info("OpenAI circuit breaker open: отдаём кэшированный ответ")
+        return cached
+    logger.info("OpenAI circuit breaker open: предлагаем быструю запись")
+    return BREAKER_FALLBACK_REPLY
+
+DEADLINE_REPLY = "Извините, время ожидания ответа истекло. Попробуйте задать вопрос еще раз."
+
+def _deadline_missed(thread_id: str, run_id: str = None):
+    """Учитывает пропуск дедлайна, отменяет run и освобождает тред"""
+    _count_deadline_stat('misses')
+    logger.warning(f"Deadline exceeded for thread {thread_id}, run {run_id}")
+    if run_id:
+        cancel_run(thread_id, run_id)
+    raise AssistantRunError(DEADLINE_REPLY)
+
+def _call_assistant_with_breaker(call, message: str, error_reply: str, log_error,
+                                 user_id=None, channel: str = None) -> str:
+    """
+    Выполняет call(message, run_options) под защитой openai_breaker.
+    Однозначные вопросы FAQ отвечаются из локального индекса без run.
+    Модель run выбирает model_router по сложности исходного сообщения.
+    Пользователи, исчерпавшие дневной лимит токенов, идут по дешёвому пути.
+    Пока breaker разомкнут - сразу отдаёт фолбэк, не дожидаясь таймаута.
+    """
+    direct_answer, run_options = prepare_assistant_request(message)
+    if direct_answer:
+        return direct_answer
+    if user_id is not None and usage_tracker.over_budget(user_id, channel):
+        logger.info(f"User {user_id} ({channel}) is over the daily token budget, using cheaper run")
+        tier = BUDGET
+        run_options = {**run_options, **usage_tracker.budget_run_options()}
+    else:
+        tier = model_router.classify(message, (channel, user_id) if user_id is not None else None)
+        run_options = {**run_options, **model_router.run_options(tier)}
+    if not openai_breaker.allow_request():
+        return assistant_fallback_reply(message)
+    _run_context.tier = tier
+    _run_context.tool_calls = False
+    start_time = time.monotonic()
+    try:
+        reply = call(message, run_options)
+    except AssistantRunError as e:
+        openai_breaker.record_failure(time.monotonic() - start_time)
+        model_router.record_run(tier, time.monotonic() - start_time, ok=False)
+        return e.user_message
+    except Exception as e:
+        openai_breaker.record_failure(time.monotonic() - start_time)
+        model_router.record_run(tier, time.monotonic() - start_time, ok=False)
+        log_error(e)
+        return error_reply
+    finally:
+        _run_context.tier = None
+    openai_breaker.record_success(time.monotonic() - start_time)
+    model_router.record_run(tier, time.monotonic() - start_time, ok=True)
+    # Ответ с вызовом функции (подтверждение записи) относится к конкретному диалогу
+    if not _run_context.tool_calls:
+        remember_answer(message, reply)
+    return reply
+
+# Текущий run: уровень модели и были ли вызовы функций. call() выполняется
+# в том же потоке, что и _call_assistant_with_breaker
+_run_context = threading.local()
+
+def _await_delivery(run_id: str):
+    """Run ответил: checkpoint снимается только после доставки ответа (confirm_delivery)"""
+    _run_context.undelivered = [*getattr(_run_context, 'undelivered', []), run_id]
+
+def take_undelivered_runs() -> list:
+    """Run'ы, ответ которых получен в этом потоке, но ещё не доставлен пользователю"""
+    run_ids = getattr(_run_context, 'undelivered', [])
+    _run_context.undelivered = []
+    return run_ids
+
+def confirm_delivery(run_ids: list, delivered: bool):
+    """
+    Вызывается каналом после отправки ответа. Доставленные run'ы снимаются
+    с checkpoint'а, недоставленные досматриваются при следующем старте.
+    """
+    for run_id in run_ids:
+        if delivered:
+            run_checkpoints.remove(run_id)
+        else:
+            logger.warning(f"Reply for run {run_id} was not delivered, it will be resumed on next start")
+            run_checkpoints.defer(run_id)
+
+def _record_usage(user_id, channel: str, usage, model: str, run_id: str):
+    usage_tracker.record(user_id, channel, usage, model, run_id)
+    tier = getattr(_run_context, 'tier', None)
+    if tier is not None:
+        model_router.record_usage(tier, model, usage)
+
+# --- ОТВЕТЫ RUN'ОВ ---
+# Ответ читается только из сообщений завершённого run (run_id + limit),
+# а не из страницы истории треда: размер запроса не зависит от длины треда
+RUN_REPLY_PAGE = 5  # сообщений run, запрашиваемых за раз
+
+def fetch_run_reply(thread_id: str, run_id: str, deadline: Deadline):
+    """Последнее текстовое сообщение ассистента, созданное run_id, или None"""
+    with span("openai.messages.list"):
+        messages = openai_client.beta.threads.messages.list(
+            thread_id=thread_id,
+            run_id=run_id,
+            order='desc',
+            limit=RUN_REPLY_PAGE,
+            timeout=deadline.timeout()
+        )
+    for message in messages.data:
+        if message.role != 'assistant':
+            continue
+        for block in message.content:
+            if block.type == 'text':
+                return block.text.value
+    return None
+
 # --- ФУНКЦИИ ---
 def save_application_to_sheets(data: dict):
     """
@@ -113,13 +463,14 @@ def save_application_to_sheets(data: dict):
         spreadsheet_id = os.getenv('GOOGLE_SHEET_ID')
         if not spreadsheet_id:
             raise ValueError("GOOGLE_SHEET_ID не найден в переменных окружения")
-        result = sheets_service.spreadsheets().values().append(
-            spreadsheetId=spreadsheet_id,
-            range=range_name,
-            valueInputOption=value_input_option,
-            insertDataOption=insert_data_option,
-            body=value_range_body
-        ).execute()
+        with span("sheets.values.append"):
+            result = sheets_pool.values().append(
+                spreadsheetId=spreadsheet_id,
+                range=range_name,
+                valueInputOption=value_input_option,
+                insertDataOption=insert_data_option,
+                body=value_range_body
+            ).execute()
         logger.info(f"Successfully saved to Google Sheets: {result}")
         return True
     except Exception as e:
@@ -137,11 +488,16 @@ def send_admin_notification(text: str):
             'text': text,
             'parse_mode': "HTML"
         }
-        response = requests.post(url, json=payload)
+        with span("telegram.sendMessage"):
+            response = requests.post(url, json=payload)
         response.raise_for_status()
     except Exception as e:
         print(f"Error in send_admin_notification: {str(e)}")
 
+def notify_admin(text: str):
+    """Уведомление в служебный чат через полосу admin: запись клиента не ждёт Telegram"""
+    scheduler.submit('admin', send_admin_notification, text)
+
 def remove_formatting(text: str) -> str:
     """
     Удаляет символы форматирования из текста
@@ -152,122 +508,295 @@ def remove_formatting(text: str) -> str:
     text = text.replace('】', '')
     return text
 
-def get_openai_assistant_reply(user_id: int, message: str) -> str:
+def get_openai_assistant_reply(user_id: int, message: str, deadline: Deadline = None) -> str:
     """
     Получает ответ от OpenAI Assistant
     """
-    try:
-        logger.info(f"Processing message from user {user_id}: {message}")
-        models = openai_client.models.list()
-        logger.info(f"Successfully connected to OpenAI. Available models: {[model.id for model in models]}")
-        assistant = openai_client.beta.assistants.retrieve(os.getenv('ASSISTANT_ID'))
-        logger.info(f"Successfully retrieved assistant: {assistant.id}")
-        if user_id not in user_threads:
-            logger.info(f"Creating new thread for user {user_id}")
-            thread = openai_client.beta.threads.create()
-            user_threads[user_id] = thread.id
-            logger.info(f"Created new thread: {thread.id}")
-        else:
-            logger.info(f"Using existing thread for user {user_id}: {user_threads[user_id]}")
-        logger.info(f"Sending message to thread {user_threads[user_id]}")
-        openai_client.beta.threads.messages.create(
-            thread_id=user_threads[user_id],
-            role="user",
-            content=message
-        )
-        logger.info("Message sent successfully")
-        logger.info(f"Starting assistant run with ID {assistant.id}")
-        run = openai_client.beta.threads.runs.create(
-            thread_id=user_threads[user_id],
-            assistant_id=assistant.id
-        )
-        logger.info(f"Run created: {run.id}")
-        max_wait = 30
-        start_time = time.time()
-        while time.time() - start_time < max_wait:
-            run = openai_client.beta.threads.runs.retrieve(
-                thread_id=user_threads[user_id],
-                run_id=run.id
-            )
-            logger.info(f"Run status: {run.status}")
-            if run.status == "completed":
-                logger.info("Run completed, retrieving messages")
-                messages = openai_client.beta.threads.messages.list(
-                    thread_id=user_threads[user_id]
-                )
-                assistant_message = messages.data[0].content[0].text.value
-                assistant_message = remove_formatting(assistant_message)
-                logger.info(f"Got response: {assistant_message[:50]}...")
-                return assistant_message
-            elif run.status == "requires_action":
-                logger.info("🔧 Run requires action, handling function calls")
-                tool_calls = run.required_action.submit_tool_outputs.tool_calls
-                tool_outputs = []
-                for tool_call in tool_calls:
-                    function_name = tool_call.function.name
-                    logger.info(f"📞 Function call: {function_name}")
-                    if function_name == "save_booking_data":
-                        try:
-                            import json
-                            from datetime import datetime
-                            function_args = json.loads(tool_call.function.arguments)
-                            logger.info(f"📋 Function arguments: {function_args}")
-                            sheets_data = {
-                                'name': function_args.get('name', ''),
-                                'phone': function_args.get('phone', ''),
-                                'service': function_args.get('service', ''),
-                                'date': function_args.get('datetime', ''),
-                                'master': function_args.get('master_category', ''),
-                                'comment': function_args.get('comments', ''),
-                                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                            }
-                            success = save_application_to_sheets(sheets_data)
-                            if success:
-                                admin_text = f"""
+    deadline = deadline or Deadline()
+    return _call_assistant_with_breaker(
+        lambda content, run_options: _get_openai_assistant_reply(user_id, content, deadline, run_options),
+        message,
+        "Извините, произошла ошибка при обработке запроса. Попробуйте позже.",
+        lambda e: logger.error(f"Error in get_openai_assistant_reply: {str(e)}", exc_info=True),
+        user_id=user_id,
+        channel='telegram'
+    )
+
+def booking_from_function_args(function_args: dict):
+    """
+    Данные записи из аргументов save_booking_data: телефон и дата
+    приводятся к единому виду, ошибки валидации возвращаются отдельно
+    """
+    sheets_data = {
+        'name': function_args.get('name', ''),
+        'phone': function_args.get('phone', ''),
+        'service': function_args.get('service', ''),
+        'date': function_args.get('datetime', ''),
+        'master': function_args.get('master_category', ''),
+        'comment': function_args.get('comments', ''),
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    sheets_data['phone'] = parse_phone(sheets_data['phone']) or sheets_data['phone']
+    sheets_data['date'] = normalize_datetime(sheets_data['date']) or sheets_data['date']
+    return sheets_data, validate_booking(sheets_data)
+
+
+def booking_clarification_output(errors: dict) -> str:
+    """Ответ функции при невалидных данных: ассистент переспрашивает клиента"""
+    return (f"❌ Запись не сохранена: {'; '.join(errors.values())}. "
+            f"Уточните эти данные у клиента и вызовите функцию снова.")
+
+
+def _handle_telegram_tool_calls(tool_calls) -> list:
+    """Выполняет вызовы функций ассистента (save_booking_data) из Telegram"""
+    _run_context.tool_calls = True
+    tool_outputs = []
+    for tool_call in tool_calls:
+        function_name = tool_call.function.name
+        logger.info(f"📞 Function call: {function_name}")
+        if function_name == "save_booking_data":
+            try:
+                function_args = json.loads(tool_call.function.arguments)
+                logger.info(f"📋 Function arguments: {function_args}")
+                sheets_data, errors = booking_from_function_args(function_args)
+                if errors:
+                    logger.info(f"📋 Booking data rejected: {errors}")
+                    tool_outputs.append({
+                        "tool_call_id": tool_call.id,
+                        "output": booking_clarification_output(errors)
+                    })
+                    continue
+                success = save_application_to_sheets(sheets_data)
+                if success:
+                    admin_text = f"""
 🤖 НОВАЯ ЗАЯВКА через Telegram бота!
 
 👤 Имя: {function_args.get('name', '')}
-📞 Телефон: {function_args.get('phone', '')}
+📞 Телефон: {sheets_data['phone']}
 💅 Услуга: {function_args.get('service', '')}
-📅 Дата: {function_args.get('datetime', '')}
+📅 Дата: {sheets_data['date']}
 👨‍🎨 Мастер: {function_args.get('master_category', '')}
 💬 Комментарий: {function_args.get('comments', 'Нет')}
 ⏰ Время: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-                                """
-                                send_admin_notification(admin_text.strip())
-                                tool_outputs.append({
-                                    "tool_call_id": tool_call.id,
-                                    "output": "✅ Запись успешно сохранена в Google Sheets! Мы свяжемся с вами для подтверждения."
-                                })
-                                logger.info("✅ Booking data saved successfully")
-                            else:
-                                tool_outputs.append({
-                                    "tool_call_id": tool_call.id,
-                                    "output": "❌ Ошибка при сохранении записи. Мы получили ваши данные и свяжемся с вами."
-                                })
-                                logger.error("❌ Failed to save booking data")
-                        except Exception as e:
-                            logger.error(f"❌ Error processing save_booking_data: {e}")
-                            tool_outputs.append({
-                                "tool_call_id": tool_call.id,
-                                "output": f"❌ Ошибка: {str(e)}"
-                            })
-                if tool_outputs:
+                    """
+                    notify_admin(admin_text.strip())
+                    tool_outputs.append({
+                        "tool_call_id": tool_call.id,
+                        "output": "✅ Запись успешно сохранена в Google Sheets! Мы свяжемся с вами для подтверждения."
+                    })
+                    logger.info("✅ Booking data saved successfully")
+                else:
+                    tool_outputs.append({
+                        "tool_call_id": tool_call.id,
+                        "output": "❌ Ошибка при сохранении записи. Мы получили ваши данные и свяжемся с вами."
+                    })
+                    logger.error("❌ Failed to save booking data")
+            except Exception as e:
+                logger.error(f"❌ Error processing save_booking_data: {e}")
+                tool_outputs.append({
+                    "tool_call_id": tool_call.id,
+                    "output": f"❌ Ошибка: {str(e)}"
+                })
+    return tool_outputs
+
+def _post_telegram_message(user_id: int, message: str, deadline: Deadline) -> str:
+    """Добавляет сообщение пользователя в его тред (создаёт тред при необходимости)"""
+    # Привязку может параллельно снять janitor - читаем её один раз
+    thread_id = user_threads.get(user_id)
+    if thread_id is None:
+        logger.info(f"Creating new thread for user {user_id}")
+        with span("openai.threads.create"):
+            thread = openai_client.beta.threads.create(timeout=deadline.timeout())
+        thread_id = user_threads[user_id] = thread.id
+        logger.info(f"Created new thread: {thread.id}")
+    else:
+        logger.info(f"Using existing thread for user {user_id}: {thread_id}")
+    thread_janitor.touch(thread_id)
+    logger.info(f"Sending message to thread {thread_id}")
+    with span("openai.messages.create"):
+        openai_client.beta.threads.messages.create(
+            thread_id=thread_id,
+            role="user",
+            content=message,
+            timeout=deadline.timeout()
+        )
+    logger.info("Message sent successfully")
+    return thread_id
+
+def _get_openai_assistant_reply(user_id: int, message: str, deadline: Deadline, run_options: dict) -> str:
+    logger.info(f"Processing message from user {user_id}: {message}")
+    with span("openai.models.list"):
+        models = openai_client.models.list(timeout=deadline.timeout())
+    logger.info(f"Successfully connected to OpenAI. Available models: {[model.id for model in models]}")
+    with span("openai.assistants.retrieve"):
+        assistant = openai_client.beta.assistants.retrieve(os.getenv('ASSISTANT_ID'), timeout=deadline.timeout())
+    logger.info(f"Successfully retrieved assistant: {assistant.id}")
+    thread_id = _post_telegram_message(user_id, message, deadline)
+    logger.info(f"Starting assistant run with ID {assistant.id}")
+    if deadline.expired():
+        _deadline_missed(thread_id)
+    with span("openai.runs.create"):
+        run = openai_client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=assistant.id,
+            timeout=deadline.timeout(),
+            **run_options
+        )
+    logger.info(f"Run created: {run.id}")
+    run_checkpoints.add(run.id, 'telegram', user_id, thread_id)
+    replied = False
+    try:
+        reply = _poll_telegram_run(user_id, thread_id, run, deadline)
+        replied = True
+        return reply
+    except AssistantRunError:
+        raise
+    except Exception:
+        # Вызов OpenAI упал по таймауту на исходе дедлайна - run нужно отменить
+        if deadline.expired():
+            _deadline_missed(thread_id, run.id)
+        raise
+    finally:
+        if replied:
+            _await_delivery(run.id)
+        else:
+            run_checkpoints.remove(run.id)
+
+def _poll_telegram_run(user_id: int, thread_id: str, run, deadline: Deadline) -> str:
+    while not deadline.expired():
+        with span("openai.runs.retrieve"):
+            run = openai_client.beta.threads.runs.retrieve(
+                thread_id=thread_id,
+                run_id=run.id,
+                timeout=deadline.timeout()
+            )
+        logger.info(f"Run status: {run.status}")
+        if run.status in ["completed", "failed", "cancelled", "expired"]:
+            _record_usage(user_id, 'telegram', run.usage, run.model, run.id)
+        if run.status == "completed":
+            logger.info("Run completed, retrieving messages")
+            assistant_message = fetch_run_reply(thread_id, run.id, deadline)
+            if assistant_message is None:
+                raise AssistantRunError("Извините, произошла ошибка при обработке запроса")
+            assistant_message = remove_formatting(assistant_message)
+            logger.info(f"Got response: {assistant_message[:50]}...")
+            return assistant_message
+        elif run.status == "requires_action":
+            logger.info("🔧 Run requires action, handling function calls")
+            tool_outputs = _handle_telegram_tool_calls(run.required_action.submit_tool_outputs.tool_calls)
+            if tool_outputs:
+                with span("openai.runs.submit_tool_outputs"):
                     run = openai_client.beta.threads.runs.submit_tool_outputs(
-                        thread_id=user_threads[user_id],
+                        thread_id=thread_id,
                         run_id=run.id,
-                        tool_outputs=tool_outputs
+                        tool_outputs=tool_outputs,
+                        timeout=deadline.timeout()
                     )
-                    logger.info("📤 Tool outputs submitted, continuing run...")
-            elif run.status in ["failed", "cancelled", "expired"]:
-                logger.error(f"Run failed with status: {run.status}")
-                return "Извините, произошла ошибка при обработке запроса"
-            time.sleep(1)
-        logger.warning("Request timed out")
-        return "Извините, время ожидания ответа истекло. Попробуйте задать вопрос еще раз."
-    except Exception as e:
-        logger.error(f"Error in get_openai_assistant_reply: {str(e)}", exc_info=True)
-        return "Извините, произошла ошибка при обработке запроса. Попробуйте позже."
+                logger.info("📤 Tool outputs submitted, continuing run...")
+        elif run.status in ["failed", "cancelled", "expired"]:
+            logger.error(f"Run failed with status: {run.status}")
+            raise AssistantRunError("Извините, произошла ошибка при обработке запроса")
+        with span("poll.sleep"):
+            time.sleep(min(1, deadline.remaining()))
+    logger.warning("Request timed out")
+    _deadline_missed(thread_id, run.id)
+
+def stream_openai_assistant_reply(user_id: int, message: str, on_text, deadline: Deadline = None) -> str:
+    """
+    Как get_openai_assistant_reply, но читает ответ потоком:
+    on_text(text) вызывается с накопленным текстом по мере прихода дельт.
+    Возвращает итоговый ответ.
+    """
+    deadline = deadline or Deadline()
+    return _call_assistant_with_breaker(
+        lambda content, run_options: _stream_openai_assistant_reply(user_id, content, on_text, deadline, run_options),
+        message,
+        "Извините, произошла ошибка при обработке запроса. Попробуйте позже.",
+        lambda e: logger.error(f"Error in stream_openai_assistant_reply: {str(e)}", exc_info=True),
+        user_id=user_id,
+        channel='telegram'
+    )
+
+def _stream_openai_assistant_reply(user_id: int, message: str, on_text, deadline: Deadline,
+                                   run_options: dict) -> str:
+    logger.info(f"Processing message from user {user_id} (stream): {message}")
+    thread_id = _post_telegram_message(user_id, message, deadline)
+    if deadline.expired():
+        _deadline_missed(thread_id)
+    with span("openai.runs.create"):
+        stream = openai_client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=os.getenv('ASSISTANT_ID'),
+            stream=True,
+            timeout=deadline.timeout(),
+            **run_options
+        )
+    run_id = None
+    text = ''
+    replied = False
+    try:
+        while stream is not None:
+            next_stream = None
+            with stream:
+                for event in stream:
+                    if deadline.expired():
+                        _deadline_missed(thread_id, run_id)
+                    if event.event == 'thread.run.created':
+                        run_id = event.data.id
+                        logger.info(f"Run created: {run_id}")
+                        run_checkpoints.add(run_id, 'telegram', user_id, thread_id)
+                    elif event.event == 'thread.message.created':
+                        # Ответом считается последнее сообщение ассистента, как в messages.data[0]
+                        text = ''
+                    elif event.event == 'thread.message.delta':
+                        for block in event.data.delta.content or []:
+                            if block.type == 'text' and block.text and block.text.value:
+                                text += block.text.value
+                        if text:
+                            on_text(remove_formatting(text))
+                    elif event.event == 'thread.run.requires_action':
+                        logger.info("🔧 Run requires action, handling function calls")
+                        tool_outputs = _handle_telegram_tool_calls(
+                            event.data.required_action.submit_tool_outputs.tool_calls
+                        )
+                        if not tool_outputs:
+                            # Пустой tool_outputs API отклоняет, а run так и ждал бы ответа до истечения
+                            logger.error("No tool outputs to submit, cancelling run")
+                            cancel_run(thread_id, run_id)
+                            raise AssistantRunError("Извините, произошла ошибка при обработке запроса")
+                        with span("openai.runs.submit_tool_outputs"):
+                            next_stream = openai_client.beta.threads.runs.submit_tool_outputs(
+                                thread_id=thread_id,
+                                run_id=run_id,
+                                tool_outputs=tool_outputs,
+                                stream=True,
+                                timeout=deadline.timeout()
+                            )
+                        logger.info("📤 Tool outputs submitted, continuing run...")
+                    elif event.event == 'thread.run.completed':
+                        _record_usage(user_id, 'telegram', event.data.usage, event.data.model, run_id)
+                    elif event.event in ['thread.run.failed', 'thread.run.cancelled', 'thread.run.expired']:
+                        _record_usage(user_id, 'telegram', event.data.usage, event.data.model, run_id)
+                        logger.error(f"Run failed with status: {event.data.status}")
+                        raise AssistantRunError("Извините, произошла ошибка при обработке запроса")
+            stream = next_stream
+        if not text:
+            raise AssistantRunError("Извините, произошла ошибка при обработке запроса")
+        replied = True
+    except AssistantRunError:
+        raise
+    except Exception:
+        if deadline.expired():
+            _deadline_missed(thread_id, run_id)
+        raise
+    finally:
+        if run_id and replied:
+            _await_delivery(run_id)
+        elif run_id:
+            run_checkpoints.remove(run_id)
+    assistant_message = remove_formatting(text)
+    logger.info(f"Got response: {assistant_message[:50]}...")
+    return assistant_message
 
 def clean_assistant_response(text: str) -> str:
     """Очистка ответа от технических символов и ссылок"""
@@ -281,102 +810,205 @@ def clean_assistant_response(text: str) -> str:
     text = re.sub(r'\s+', ' ', text).strip()
     return text
 
-def chat_with_assistant(message: str, user_id: str = None):
+def chat_with_assistant(message: str, user_id: str = None, deadline: Deadline = None):
     """Общение с OpenAI Assistant с поддержкой Function Calling и памятью диалога"""
     if not openai_client:
         return "Извините, Assistant API временно недоступен. Воспользуйтесь быстрой записью или обратитесь к администратору."
-    try:
-        assistant_id = os.getenv('ASSISTANT_ID')
-        if not assistant_id:
-            return "Ошибка конфигурации Assistant API."
-        MAX_MESSAGES = 12
-        if user_id and user_id in web_threads:
-            message_count = web_message_counts.get(user_id, 0)
-            if message_count >= MAX_MESSAGES:
-                thread = openai_client.beta.threads.create()
-                thread_id = thread.id
-                web_threads[user_id] = thread_id
-                web_message_counts[user_id] = 0
-            else:
-                thread_id = web_threads[user_id]
-        else:
-            thread = openai_client.beta.threads.create()
+    assistant_id = os.getenv('ASSISTANT_ID')
+    if not assistant_id:
+        return "Ошибка конфигурации Assistant API."
+    deadline = deadline or Deadline()
+    return _call_assistant_with_breaker(
+        lambda content, run_options: _chat_with_assistant(content, user_id, assistant_id, deadline, run_options),
+        message,
+        "Извините, произошла ошибка при обработке вашего запроса.",
+        lambda e: print(f"Ошибка при общении с Assistant: {str(e)}"),
+        user_id=user_id,
+        channel='web'
+    )
+
+def _chat_with_assistant(message: str, user_id: str, assistant_id: str, deadline: Deadline,
+                         run_options: dict) -> str:
+    MAX_MESSAGES = 12
+    current_thread_id = web_threads.get(user_id) if user_id else None
+    if current_thread_id:
+        message_count = web_message_counts.get(user_id, 0)
+        if message_count >= MAX_MESSAGES:
+            with span("openai.threads.create"):
+                thread = openai_client.beta.threads.create(timeout=deadline.timeout())
             thread_id = thread.id
-            if user_id:
-                web_threads[user_id] = thread_id
-                web_message_counts[user_id] = 0
+            web_threads[user_id] = thread_id
+            web_message_counts[user_id] = 0
+            thread_janitor.abandon(current_thread_id)
+        else:
+            thread_id = current_thread_id
+    else:
+        with span("openai.threads.create"):
+            thread = openai_client.beta.threads.create(timeout=deadline.timeout())
+        thread_id = thread.id
         if user_id:
-            web_message_counts[user_id] = web_message_counts.get(user_id, 0) + 1
+            web_threads[user_id] = thread_id
+            web_message_counts[user_id] = 0
+    if user_id:
+        thread_janitor.touch(thread_id)
+    else:
+        # Тред анонимного запроса больше никому не нужен
+        thread_janitor.abandon(thread_id)
+    if user_id:
+        web_message_counts[user_id] = web_message_counts.get(user_id, 0) + 1
+    with span("openai.messages.create"):
         openai_client.beta.threads.messages.create(
             thread_id=thread_id,
             role="user",
-            content=message
+            content=message,
+            timeout=deadline.timeout()
         )
+    if deadline.expired():
+        _deadline_missed(thread_id)
+    with span("openai.runs.create"):
         run = openai_client.beta.threads.runs.create(
             thread_id=thread_id,
-            assistant_id=assistant_id
+            assistant_id=assistant_id,
+            timeout=deadline.timeout(),
+            **run_options
         )
-        import time
-        while run.status in ['queued', 'in_progress', 'cancelling']:
-            time.sleep(1)
+    run_checkpoints.add(run.id, 'web', user_id, thread_id)
+    replied = False
+    try:
+        reply = _poll_web_run(user_id, thread_id, run, deadline)
+        replied = True
+        return reply
+    except AssistantRunError:
+        raise
+    except Exception:
+        if deadline.expired():
+            _deadline_missed(thread_id, run.id)
+        raise
+    finally:
+        if replied:
+            _await_delivery(run.id)
+        else:
+            run_checkpoints.remove(run.id)
+
+def _poll_web_run(user_id: str, thread_id: str, run, deadline: Deadline) -> str:
+    # requires_action в начале - run, восстановленный после перезапуска
+    while run.status in ['queued', 'in_progress', 'cancelling', 'requires_action']:
+        if deadline.expired():
+            _deadline_missed(thread_id, run.id)
+        with span("poll.sleep"):
+            time.sleep(min(1, deadline.remaining()))
+        with span("openai.runs.retrieve"):
             run = openai_client.beta.threads.runs.retrieve(
                 thread_id=thread_id,
-                run_id=run.id
+                run_id=run.id,
+                timeout=deadline.timeout()
             )
-            if run.status == 'requires_action':
-                tool_calls = run.required_action.submit_tool_outputs.tool_calls
-                tool_outputs = []
-                for tool_call in tool_calls:
-                    function_name = tool_call.function.name
-                    import json
-                    function_args = json.loads(tool_call.function.arguments)
-                    if function_name == "save_booking_data":
-                        sheets_data = {
-                            'name': function_args.get('name', ''),
-                            'phone': function_args.get('phone', ''),
-                            'service': function_args.get('service', ''),
-                            'date': function_args.get('datetime', ''),
-                            'master': function_args.get('master_category', ''),
-                            'comment': function_args.get('comments', ''),
-                            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        }
-                        success = save_application_to_sheets(sheets_data)
-                        if success:
-                            admin_text = f"""
+        if run.status == 'requires_action':
+            tool_calls = run.required_action.submit_tool_outputs.tool_calls
+            _run_context.tool_calls = True
+            tool_outputs = []
+            for tool_call in tool_calls:
+                function_name = tool_call.function.name
+                function_args = json.loads(tool_call.function.arguments)
+                if function_name == "save_booking_data":
+                    sheets_data, errors = booking_from_function_args(function_args)
+                    if errors:
+                        logger.info(f"📋 Booking data rejected: {errors}")
+                        tool_outputs.append({
+                            "tool_call_id": tool_call.id,
+                            "output": booking_clarification_output(errors)
+                        })
+                        continue
+                    success = save_application_to_sheets(sheets_data)
+                    if success:
+                        admin_text = f"""
 🌐 НОВАЯ ЗАЯВКА через веб-виджет!
 
 👤 Имя: {function_args.get('name', '')}
-📞 Телефон: {function_args.get('phone', '')}
+📞 Телефон: {sheets_data['phone']}
 💅 Услуга: {function_args.get('service', '')}
-📅 Дата: {function_args.get('datetime', '')}
+📅 Дата: {sheets_data['date']}
 👨‍🎨 Мастер: {function_args.get('master_category', '')}
 💬 Комментарий: {function_args.get('comments', 'Нет')}
 ⏰ Время: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-                            """
-                            send_admin_notification(admin_text.strip())
-                        result = {
-                            "success": success,
-                            "message": "Запись успешно сохранена!" if success else "Ошибка при сохранении записи"
-                        }
-                        tool_outputs.append({
-                            "tool_call_id": tool_call.id,
-                            "output": str(result)
-                        })
+                        """
+                        notify_admin(admin_text.strip())
+                    result = {
+                        "success": success,
+                        "message": "Запись успешно сохранена!" if success else "Ошибка при сохранении записи"
+                    }
+                    tool_outputs.append({
+                        "tool_call_id": tool_call.id,
+                        "output": str(result)
+                    })
+            with span("openai.runs.submit_tool_outputs"):
                 run = openai_client.beta.threads.runs.submit_tool_outputs(
                     thread_id=thread_id,
                     run_id=run.id,
-                    tool_outputs=tool_outputs
+                    tool_outputs=tool_outputs,
+                    timeout=deadline.timeout()
                 )
-        if run.status == 'completed':
-            messages = openai_client.beta.threads.messages.list(
-                thread_id=thread_id
-            )
-            for message in messages.data:
-                if message.role == "assistant":
-                    raw_response = message.content[0].text.value
-                    cleaned_response = clean_assistant_response(raw_response)
-                    return cleaned_response
-        return "Извините, произошла ошибка при обработке вашего запроса."
-    except Exception as e:
-        print(f"Ошибка при общении с Assistant: {str(e)}")
-        return "Извините, произошла ошибка при обработке вашего запроса." 
+    _record_usage(user_id, 'web', run.usage, run.model, run.id)
+    if run.status == 'completed':
+        raw_response = fetch_run_reply(thread_id, run.id, deadline)
+        if raw_response is not None:
+            return clean_assistant_response(raw_response)
+    raise AssistantRunError("Извините, произошла ошибка при обработке вашего запроса.")
+
+
+# ==============================
+# ВОССТАНОВЛЕНИЕ ПОСЛЕ ПЕРЕЗАПУСКА
+# ==============================
+
+def _resume_run(checkpoint: dict) -> str:
+    thread_id = checkpoint['thread_id']
+    user_id = checkpoint['user_id']
+    deadline = Deadline()
+    with span("openai.runs.retrieve"):
+        run = openai_client.beta.threads.runs.retrieve(
+            thread_id=thread_id,
+            run_id=checkpoint['run_id'],
+            timeout=deadline.timeout()
+        )
+    logger.info(f"Resuming run {run.id} ({checkpoint['channel']}, user {user_id}): {run.status}")
+    thread_janitor.touch(thread_id)
+    if checkpoint['channel'] == 'web':
+        web_threads.setdefault(user_id, thread_id)
+        return _poll_web_run(user_id, thread_id, run, deadline)
+    user_threads.setdefault(user_id, thread_id)
+    return _poll_telegram_run(user_id, thread_id, run, deadline)
+
+
+def resume_pending_runs(deliver):
+    """
+    Досматривает run'ы, прерванные остановкой процесса, и отдаёт ответы
+    через deliver(checkpoint, reply) -> bool. Checkpoint снимается после
+    доставки; недоставленный ответ повторяется при следующем старте.
+    Вызывается после initialize_openai.
+    """
+    checkpoints = run_checkpoints.pending()
+    if not checkpoints:
+        return
+    if openai_client is None:
+        logger.error(f"Cannot resume {len(checkpoints)} runs: OpenAI is not initialized")
+        return
+    logger.info(f"Resuming {len(checkpoints)} unfinished runs")
+    for checkpoint in checkpoints:
+        try:
+            reply = _resume_run(checkpoint)
+        except AssistantRunError as e:
+            reply = e.user_message
+        except Exception as e:
+            logger.error(f"Error resuming run {checkpoint['run_id']}: {e}")
+            reply = None
+        delivered = True
+        if reply:
+            try:
+                delivered = deliver(checkpoint, reply)
+            except Exception as e:
+                logger.error(f"Error delivering resumed reply for run {checkpoint['run_id']}: {e}")
+                delivered = False
+        if delivered:
+            run_checkpoints.remove(checkpoint['run_id'])
+        else:
+            logger.warning(f"Resumed reply for run {checkpoint['run_id']} was not delivered, will retry on next start")
@@ -0,0 +1,61 @@
+import re
+
+BOOKING = 'booking'
+GREETING = 'greeting'
+QUESTION = 'question'
+
+# Явное желание записаться: "хочу записаться", "запишите меня", "можно записаться на завтра".
+# Существительное "бронь" само по себе - не запрос ("у меня бронь на завтра, можно перенести?")
+_BOOKING_RE = re.compile(
+    r'\b(запиш(и|ите)(\s+меня)?|хочу\s+(записаться|запись|прийти|попасть|на\s+тренировк\w*|бронь)'
+    r'|хотел(а)?\s+бы\s+(записаться|прийти|попасть)|забронир\w*|(нужна|оформить|сделать)\s+бронь'
+    r'|можно\s+(записаться|прийти)\s+(на|в|к|завтра|сегодня|послезавтра))'
+)
+# Глагол записи + указание времени: "записаться на завтра в 14:00".
+# Только инфинитив и повелительное: "запись", "записалась", "записываться" бывают и в отмене, и в вопросе
+_BOOKING_VERB_RE = re.compile(r'\b(записаться|запишите|запиши)\b')
+# Отмена, перенос и отказ - не новая запись ("хочу отменить запись", "не хочу записываться на завтра")
+_NOT_BOOKING_RE = re.compile(r'\b(отмен\w*|перенес\w*|перенест\w*|не\s+(\w+\s+)?(запис|заброн|бронир|прий|прид|попа)\w*)')
+_TIME_RE = re.compile(
+    r'\b(сегодня|завтра|послезавтра|понедельник|вторник|сред[ау]|четверг|пятниц[ау]|суббот[ау]'
+    r'|воскресенье|утр\w*|вечер\w*|\d{1,2}[:.]\d{2}|\d{1,2}\s+(января|февраля|марта|апреля|мая|июня'
+    r'|июля|августа|сентября|октября|ноября|декабря))\b'
+)
+# Вопросы о процедуре записи ("как записаться?", "где можно записаться?") - к ассистенту
+_QUESTION_START_RE = re.compile(
+    r'^(как|где|сколько|какие|какой|какая|что|почему|зачем|есть\s+ли|нужн\w*\s+ли|можно\s+ли|а\s+как|а\s+где)\b'
+)
+_GREETING_RE = re.compile(
+    r'^(привет\w*|здравствуй\w*|добр\w+\s+(день|утро|вечер|ночи)|доброе\s+утро|хай|hello|hi'
+    r'|салют|приветики|здрасте|ку)[\s!.,)]*$'
+)
+
+
+def _normalize(text: str) -> str:
+    text = text.lower().replace('ё', 'е')
+    # Эмодзи и прочие символы не влияют на намерение
+    text = re.sub(r'[^\w\s:.,!?-]', ' ', text)
+    return ' '.join(text.split())
+
+
+def classify_intent(text: str) -> str:
+    """
+    Быстрая локальная классификация сообщения в режиме консультации:
+    BOOKING - явная просьба записаться, GREETING - приветствие,
+    QUESTION - всё остальное (отправляется ассистенту).
+    Неоднозначные случаи считаются вопросом.
+    """
+    normalized = _normalize(text)
+    if not normalized:
+        return QUESTION
+    if _GREETING_RE.match(normalized):
+        return GREETING
+    if _QUESTION_START_RE.match(normalized):
+        return QUESTION
+    if _NOT_BOOKING_RE.search(normalized):
+        return QUESTION
+    if _BOOKING_RE.search(normalized):
+        return BOOKING
+    if _BOOKING_VERB_RE.search(normalized) and _TIME_RE.search(normalized):
+        return BOOKING
+    return QUESTION
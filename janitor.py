@@ -0,0 +1,195 @@
+import os
+import time
+import threading
+import logging
+from collections import deque
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Тред пользователя, не использованный THREAD_TTL_HOURS, удаляется вместе с привязкой
+THREAD_TTL_HOURS = float(os.getenv('THREAD_TTL_HOURS', '72'))
+# Незавершённая запись / режим консультации без сообщений дольше USER_STATE_TTL_HOURS сбрасывается
+USER_STATE_TTL_HOURS = float(os.getenv('USER_STATE_TTL_HOURS', '24'))
+JANITOR_INTERVAL_MINUTES = float(os.getenv('JANITOR_INTERVAL_MINUTES', '10'))
+# Удаление тредов в OpenAI: не больше JANITOR_DELETE_BATCH за проход и JANITOR_DELETE_PER_SECOND в секунду
+JANITOR_DELETE_BATCH = int(os.getenv('JANITOR_DELETE_BATCH', '50'))
+JANITOR_DELETE_PER_SECOND = float(os.getenv('JANITOR_DELETE_PER_SECOND', '2'))
+# Тред, брошенный ротацией, удаляется после паузы: им может ещё пользоваться параллельный запрос
+ABANDONED_GRACE_SECONDS = 600
+DELETE_ATTEMPTS = 3
+
+
+class ThreadJanitor:
+    """
+    Уборка долгоживущего состояния.
+    - Треды OpenAI: время последнего использования отмечается через touch();
+      привязки user_id -> thread_id, простаивающие дольше TTL, удаляются,
+      а сами треды (и брошенные при ротации, см. abandon()) удаляются в
+      OpenAI пачками с ограничением частоты. Треды с активным run не трогаются.
+    - Словари состояний (user_states): записи с updated_at старше TTL.
+    """
+
+    def __init__(self, delete_thread, active_threads, thread_ttl: float = THREAD_TTL_HOURS * 3600):
+        self._delete_thread = delete_thread  # thread_id -> None, исключение при ошибке
+        self._active_threads = active_threads  # () -> set thread_id с активными run
+        self.thread_ttl = thread_ttl
+        self._lock = threading.Lock()
+        self._last_used = {}  # thread_id -> time.time() последнего использования
+        self._abandoned = {}  # thread_id -> время, когда тред брошен
+        self._delete_queue = deque()  # (thread_id, попытка)
+        self._thread_maps = []  # (name, {key: thread_id}, [связанные словари по key])
+        self._state_stores = []  # (name, {key: state с updated_at}, ttl)
+        self._thread = None
+        self._stop = threading.Event()
+        self.stats = {
+            'sweeps': 0,
+            'expired_threads': 0,
+            'expired_states': 0,
+            'deleted_threads': 0,
+            'delete_errors': 0,
+            'last_sweep': None
+        }
+
+    # --- регистрация ---
+
+    def add_thread_map(self, name: str, mapping: dict, *related: dict):
+        """Привязки key -> thread_id; related - словари по тому же key, чистятся вместе с привязкой"""
+        self._thread_maps.append((name, mapping, related))
+
+    def add_state_store(self, name: str, store: dict, ttl: float = USER_STATE_TTL_HOURS * 3600):
+        self._state_stores.append((name, store, ttl))
+
+    def touch(self, thread_id: str):
+        with self._lock:
+            self._last_used[thread_id] = time.time()
+            self._abandoned.pop(thread_id, None)
+
+    def abandon(self, thread_id: str):
+        """Тред больше не привязан к пользователю (ротация) - удалить после паузы"""
+        with self._lock:
+            self._abandoned[thread_id] = time.time()
+
+    # --- уборка ---
+
+    def _expire_mappings(self, now: float, active: set) -> list:
+        expired = []
+        with self._lock:
+            last_used = dict(self._last_used)
+        for name, mapping, related in self._thread_maps:
+            for key, thread_id in list(mapping.items()):
+                used_at = last_used.get(thread_id)
+                if used_at is None:
+                    # Тред из прошлой жизни процесса: отсчёт простоя начинается сейчас
+                    self.touch(thread_id)
+                    continue
+                if now - used_at < self.thread_ttl or thread_id in active:
+                    continue
+                if mapping.get(key) == thread_id:
+                    mapping.pop(key, None)
+                    for store in related:
+                        store.pop(key, None)
+                    expired.append(thread_id)
+            # Счётчики без привязки (например, после ручной очистки)
+            for store in related:
+                for key in list(store):
+                    if key not in mapping:
+                        store.pop(key, None)
+        # Тред без привязки (ротация, которую опередил параллельный запрос) - брошенный
+        mapped = {thread_id for _, mapping, _ in self._thread_maps for thread_id in list(mapping.values())}
+        for thread_id, used_at in last_used.items():
+            if (thread_id not in mapped and thread_id not in active and thread_id not in expired
+                    and now - used_at >= ABANDONED_GRACE_SECONDS):
+                expired.append(thread_id)
+        return expired
+
+    def _expire_states(self, now: float) -> int:
+        count = 0
+        for name, store, ttl in self._state_stores:
+            for key, state in list(store.items()):
+                updated_at = state.get('updated_at')
+                if updated_at is None:
+                    state['updated_at'] = now
+                elif now - updated_at >= ttl and store.get(key) is state:
+                    store.pop(key, None)
+                    count += 1
+        return count
+
+    def sweep(self):
+        now = time.time()
+        active = self._active_threads()
+        expired = self._expire_mappings(now, active)
+        expired_states = self._expire_states(now)
+        with self._lock:
+            for thread_id, abandoned_at in list(self._abandoned.items()):
+                if now - abandoned_at >= ABANDONED_GRACE_SECONDS and thread_id not in active:
+                    del self._abandoned[thread_id]
+                    if thread_id not in expired:
+                        expired.append(thread_id)
+            for thread_id in expired:
+                self._last_used.pop(thread_id, None)
+                self._delete_queue.append((thread_id, 1))
+            self.stats['sweeps'] += 1
+            self.stats['expired_threads'] += len(expired)
+            self.stats['expired_states'] += expired_states
+            self.stats['last_sweep'] = round(now, 3)
+        if expired or expired_states:
+            logger.info(f"Janitor: {len(expired)} threads queued for deletion, {expired_states} states expired")
+        self._delete_batch(active)
+
+    def _delete_batch(self, active: set):
+        retry = []  # неудачные удаления повторяются на следующем проходе
+        for _ in range(JANITOR_DELETE_BATCH):
+            if self._stop.is_set():
+                break
+            with self._lock:
+                if not self._delete_queue:
+                    break
+                thread_id, attempt = self._delete_queue.popleft()
+                # Тред снова в деле (resume или повторная привязка) - не удаляем
+                if thread_id in self._last_used or thread_id in active:
+                    continue
+            try:
+                self._delete_thread(thread_id)
+                with self._lock:
+                    self.stats['deleted_threads'] += 1
+            except Exception as e:
+                logger.warning(f"Janitor: failed to delete thread {thread_id} (attempt {attempt}): {e}")
+                with self._lock:
+                    self.stats['delete_errors'] += 1
+                if attempt < DELETE_ATTEMPTS:
+                    retry.append((thread_id, attempt + 1))
+            time.sleep(1 / JANITOR_DELETE_PER_SECOND)
+        with self._lock:
+            self._delete_queue.extend(retry)
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Janitor sweep error: {e}", exc_info=True)
+
+    def start(self, interval: float = JANITOR_INTERVAL_MINUTES * 60) -> bool:
+        if interval <= 0:
+            return False
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(interval,), name="janitor", daemon=True)
+            self._thread.start()
+            logger.info(f"Janitor started (every {interval / 60:.0f} min)")
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'enabled': self._thread is not None,
+                'tracked_threads': len(self._last_used),
+                'abandoned_threads': len(self._abandoned),
+                'delete_queue': len(self._delete_queue),
+                **self.stats
+            }
@@ -0,0 +1,210 @@
+import os
+import re
+import sys
+import json
+import math
+import argparse
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = {
+    'и', 'в', 'во', 'не', 'что', 'он', 'на', 'я', 'с', 'со', 'как', 'а', 'то', 'все', 'она',
+    'так', 'его', 'но', 'да', 'ты', 'к', 'у', 'же', 'вы', 'за', 'бы', 'по', 'только', 'ее',
+    'мне', 'было', 'вот', 'от', 'меня', 'еще', 'нет', 'о', 'из', 'ему', 'ли', 'если', 'или',
+    'ни', 'быть', 'был', 'до', 'вас', 'нибудь', 'уже', 'вам', 'там', 'потом', 'себя', 'ничего',
+    'ей', 'может', 'они', 'тут', 'где', 'есть', 'надо', 'ней', 'для', 'мы', 'тебя', 'их', 'чем',
+    'была', 'сам', 'чтоб', 'без', 'будто', 'чего', 'раз', 'тоже', 'себе', 'под', 'будет', 'ж',
+    'тогда', 'кто', 'этот', 'того', 'потому', 'этого', 'какой', 'ним', 'здесь', 'этом', 'один',
+    'мой', 'тем', 'чтобы', 'нее', 'были', 'куда', 'зачем', 'всех', 'можно', 'при', 'об', 'про',
+    'ваш', 'вашего', 'вашем', 'это', 'эти', 'подскажите', 'скажите', 'пожалуйста'
+}
+
+# Грубый стеммер: отрезаем самые частые окончания русских слов
+_SUFFIXES = sorted([
+    'иями', 'ями', 'ами', 'иях', 'ях', 'ах', 'ией', 'ий', 'ый', 'ой', 'ая', 'яя', 'ое', 'ее',
+    'ые', 'ие', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ом', 'ем', 'ам', 'ям', 'ов', 'ев',
+    'ей', 'ию', 'ью', 'ия', 'ья', 'ье', 'ть', 'ться', 'тся', 'ет', 'ут', 'ют', 'ит', 'ат',
+    'ят', 'ешь', 'ишь', 'ете', 'ите', 'ла', 'ли', 'ло', 'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь'
+], key=len, reverse=True)
+
+TOKEN_RE = re.compile(r'[a-zа-яё0-9]+')
+
+
+def stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> list:
+    """Токены для BM25: нижний регистр, без стоп-слов, со стеммингом"""
+    words = TOKEN_RE.findall(text.lower().replace('ё', 'е'))
+    return [stem(word) for word in words if word not in STOPWORDS]
+
+
+# ==============================
+# ПОСТРОЕНИЕ ИНДЕКСА (офлайн)
+# ==============================
+
+def _read_documents(path: str):
+    """
+    Документы базы знаний:
+    - *.json: список {"question": ..., "answer": ...} (формат из README);
+    - *.txt / *.md: прайс-листы и прочие тексты, абзацы через пустую строку.
+    """
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            yield from _read_documents(os.path.join(path, name))
+        return
+    source = os.path.basename(path)
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for item in json.load(f):
+                yield {
+                    'kind': 'faq',
+                    'source': source,
+                    'question': item['question'].strip(),
+                    'text': item['answer'].strip()
+                }
+    elif path.endswith(('.txt', '.md')):
+        with open(path, 'r', encoding='utf-8') as f:
+            for paragraph in re.split(r'\n\s*\n', f.read()):
+                paragraph = paragraph.strip()
+                if paragraph:
+                    yield {'kind': 'passage', 'source': source, 'question': '', 'text': paragraph}
+
+
+def build_index(paths: list) -> dict:
+    """Строит BM25-индекс по файлам базы знаний"""
+    docs = []
+    postings = {}
+    for path in paths:
+        for doc in _read_documents(path):
+            terms = tokenize(f"{doc['question']} {doc['text']}")
+            if not terms:
+                continue
+            doc['length'] = len(terms)
+            for term, tf in Counter(terms).items():
+                postings.setdefault(term, []).append([len(docs), tf])
+            docs.append(doc)
+    if not docs:
+        raise ValueError("База знаний пуста: не найдено ни одного документа")
+    n = len(docs)
+    idf = {
+        term: math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+        for term, plist in postings.items()
+    }
+    return {
+        'version': INDEX_VERSION,
+        'avgdl': sum(doc['length'] for doc in docs) / n,
+        'docs': docs,
+        'postings': postings,
+        'idf': idf
+    }
+
+
+# ==============================
+# ПОИСК
+# ==============================
+
+class KnowledgeIndex:
+    """BM25-индекс базы знаний клуба, загружаемый при старте"""
+
+    def __init__(self, data: dict):
+        if data.get('version') != INDEX_VERSION:
+            raise ValueError(f"Неподдерживаемая версия индекса: {data.get('version')}")
+        self.docs = data['docs']
+        self.postings = data['postings']
+        self.idf = data['idf']
+        self.avgdl = data['avgdl']
+        # Токены вопросов FAQ - для оценки уверенности прямого ответа
+        self._question_terms = [set(tokenize(doc['question'])) for doc in self.docs]
+
+    @classmethod
+    def load(cls, path: str) -> 'KnowledgeIndex':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def search(self, query: str, k: int = 3) -> list:
+        """Топ-k документов: список (score, doc_index)"""
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_index, tf in self.postings[term]:
+                norm = 1 - BM25_B + BM25_B * self.docs[doc_index]['length'] / self.avgdl
+                score = idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+                scores[doc_index] = scores.get(doc_index, 0.0) + score
+        return sorted(((score, i) for i, score in scores.items()), reverse=True)[:k]
+
+    def direct_answer(self, query: str, min_coverage: float = 0.8, min_margin: float = 1.3):
+        """
+        Ответ FAQ без обращения к ассистенту, если совпадение однозначное:
+        лучший документ - вопрос FAQ, покрывающий почти все слова запроса,
+        и он заметно лучше второго результата.
+        """
+        query_terms = set(tokenize(query))
+        hits = self.search(query, k=2)
+        if not query_terms or not hits:
+            return None
+        top_score, top_index = hits[0]
+        if self.docs[top_index]['kind'] != 'faq':
+            return None
+        coverage = len(query_terms & self._question_terms[top_index]) / len(query_terms)
+        if coverage < min_coverage:
+            return None
+        if len(hits) > 1 and top_score < hits[1][0] * min_margin:
+            return None
+        return self.docs[top_index]['text']
+
+    def passages(self, query: str, k: int = 3, min_score: float = 1.0) -> list:
+        """Тексты лучших документов для подстановки в сообщение ассистенту"""
+        result = []
+        for score, doc_index in self.search(query, k):
+            if score < min_score:
+                break
+            doc = self.docs[doc_index]
+            if doc['question']:
+                result.append(f"{doc['question']}\n{doc['text']}")
+            else:
+                result.append(doc['text'])
+        return result
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Офлайн-сборка и проверка индекса базы знаний клуба")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='собрать индекс из FAQ (.json) и текстов (.txt/.md)')
+    build_parser.add_argument('paths', nargs='+')
+    build_parser.add_argument('-o', '--output', default='knowledge_index.json')
+    search_parser = subparsers.add_parser('search', help='проверить поиск по индексу')
+    search_parser.add_argument('query')
+    search_parser.add_argument('-i', '--index', default='knowledge_index.json')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        index = build_index(args.paths)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        logger.info(f"Индекс сохранён в {args.output}: {len(index['docs'])} документов, "
+                    f"{len(index['postings'])} термов")
+    else:
+        index = KnowledgeIndex.load(args.index)
+        answer = index.direct_answer(args.query)
+        print(f"Прямой ответ: {answer or '—'}")
+        for score, doc_index in index.search(args.query, k=5):
+            doc = index.docs[doc_index]
+            print(f"{score:6.2f}  [{doc['kind']}] {(doc['question'] or doc['text'])[:80]}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
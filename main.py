@@ -1,20 +1,43 @@
 import os
+import sys
 import time
+import signal
 import logging
+import threading
 import requests
-from flask import Flask, request, jsonify
+from collections import Counter, OrderedDict
+from flask import Flask, request, jsonify, abort
 from flask_cors import CORS
 from dotenv import load_dotenv
 
 from functions import (
     get_openai_assistant_reply,
+    stream_openai_assistant_reply,
     save_application_to_sheets,
-    send_admin_notification,
+    notify_admin,
     chat_with_assistant,
-    initialize_openai,
-    initialize_sheets
+    initialize_dependencies,
+    dependencies_ready,
+    dependency_status,
+    openai_breaker,
+    deadline_stats,
+    resume_pending_runs,
+    take_undelivered_runs,
+    confirm_delivery,
+    thread_janitor
 )
 from url_manager import get_webhook_url
+from webhook_reconciler import WebhookReconciler
+from usage_tracker import usage_tracker
+from model_router import model_router
+from run_checkpoints import run_checkpoints
+from intent_router import classify_intent, BOOKING, GREETING, QUESTION
+from scheduler import scheduler
+from slot_parser import (
+    parse_phone, normalize_datetime, parse_master_category, extract_slots, validate_booking
+)
+import tracing
+from tracing import span, traced, profiler
 
 # ==============================
 # БАЗОВЫЕ НАСТРОЙКИ
@@ -33,17 +56,50 @@ TELEGRAM_API_URL = f"https://api.telegram.org/bot{BOT_TOKEN}"
 
 SECRET_COMMAND = "get_tunnel_url_worldclass_2024"
 
+# Токен для /debug/*: без него отладочные эндпоинты отключены
+DEBUG_TOKEN = os.getenv("DEBUG_TOKEN")
+
 MAIN_KEYBOARD = [["Быстрая запись"], ["Консультация"]]
 
+# Консультации: потоковый ответ с редактированием сообщения вместо одного ответа в конце
+STREAM_REPLIES = os.getenv("TELEGRAM_STREAM_REPLIES", "0") == "1"
+TYPING_INTERVAL = 4  # сек: статус "печатает" в Telegram гаснет через ~5 сек
+EDIT_INTERVAL = float(os.getenv("TELEGRAM_EDIT_INTERVAL", "1.5"))  # сек между editMessageText
+TELEGRAM_MESSAGE_LIMIT = 4096
+
 # Состояния пользователей (Telegram)
 user_states = {}
 
+# Незавершённые записи и режимы сбрасываются после USER_STATE_TTL_HOURS простоя
+thread_janitor.add_state_store("user_states", user_states)
+
+# Сверка вебхука с туннелем ngrok и метрики очереди Telegram
+webhook_reconciler = WebhookReconciler(BOT_TOKEN)
+
+# Остановка: новые запросы получают 503, активные run'ы дорабатывают до SHUTDOWN_DRAIN_SECONDS
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "30"))
+draining = threading.Event()
+
+# Ответы виджету, досчитанные после перезапуска: отдаются со следующим ответом пользователю
+pending_web_replies = {}
+pending_web_replies_lock = threading.Lock()
+
+# Виджет: браузер кэширует ответ на preflight (OPTIONS) на CORS_MAX_AGE сек
+# (Chrome ограничивает 2 часами, Firefox - сутками)
+CORS_MAX_AGE = int(os.getenv("CORS_MAX_AGE", "86400"))
+# Повтор сообщения виджета с тем же message_id получает уже готовый ответ
+WEB_DEDUPE_SIZE = 1000
+web_replies = OrderedDict()  # (user_id, message_id) -> {"done": Event, "response": str}
+website_chat_stats = Counter()  # options / post / duplicates
+web_replies_lock = threading.Lock()
+
 # Flask
 app = Flask(__name__)
 CORS(app,
      origins=["https://world-class-fitness-club.tilda.ws"],
      methods=["GET", "POST", "OPTIONS"],
-     allow_headers=["Content-Type", "ngrok-skip-browser-warning"])
+     allow_headers=["Content-Type", "ngrok-skip-browser-warning"],
+     max_age=CORS_MAX_AGE)
 
 
 # ==============================
@@ -59,7 +115,8 @@ def send_message(chat_id: int, text: str, keyboard=None):
         payload["reply_markup"] = {"keyboard": keyboard, "resize_keyboard": True}
 
     try:
-        response = requests.post(url, json=payload, timeout=30).json()
+        with span("telegram.sendMessage"):
+            response = requests.post(url, json=payload, timeout=30).json()
         if not response.get("ok", False):
             logger.error(f"Telegram API error: {response}")
         return response
@@ -68,6 +125,210 @@ def send_message(chat_id: int, text: str, keyboard=None):
         return None
 
 
+def send_chat_action(chat_id: int, action: str = "typing"):
+    """Отправка статуса (например, "печатает") через Telegram API"""
+    try:
+        with span("telegram.sendChatAction"):
+            requests.post(f"{TELEGRAM_API_URL}/sendChatAction",
+                          json={"chat_id": chat_id, "action": action}, timeout=10)
+    except requests.RequestException as e:
+        logger.error(f"Error sending chat action: {e}")
+
+
+def edit_message_text(chat_id: int, message_id: int, text: str):
+    """Редактирование отправленного сообщения через Telegram API"""
+    url = f"{TELEGRAM_API_URL}/editMessageText"
+    payload = {"chat_id": chat_id, "message_id": message_id, "text": text}
+    try:
+        with span("telegram.editMessageText"):
+            return requests.post(url, json=payload, timeout=30).json()
+    except requests.RequestException as e:
+        logger.error(f"Error editing message: {e}")
+        return None
+
+
+def _sent(response) -> bool:
+    """Ответ Telegram API об успешной отправке"""
+    return bool(response and response.get("ok"))
+
+
+class TypingIndicator:
+    """Пока активен, раз в TYPING_INTERVAL отправляет в чат статус «печатает»"""
+
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"typing-{chat_id}", daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            send_chat_action(self.chat_id, "typing")
+            self._stop.wait(TYPING_INTERVAL)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+
+
+class ProgressiveReply:
+    """
+    Ответ, который растёт по мере генерации: первое обновление отправляет
+    сообщение, следующие редактируют его не чаще раза в EDIT_INTERVAL
+    (и с учётом retry_after, если Telegram ответил 429).
+    Клавиатура прикрепляется к первому сообщению: editMessageText принимает
+    только inline-клавиатуры, а обычная остаётся в чате после правок.
+    """
+
+    def __init__(self, chat_id: int, keyboard=None):
+        self.chat_id = chat_id
+        self.keyboard = keyboard
+        self.message_id = None
+        self._shown_text = ""
+        self._next_edit_at = 0.0
+
+    def _apply(self, text: str):
+        if self.message_id is None:
+            response = send_message(self.chat_id, text, self.keyboard)
+            if response and response.get("ok"):
+                self.message_id = response["result"]["message_id"]
+                self._shown_text = text
+            return
+        response = edit_message_text(self.chat_id, self.message_id, text)
+        if response is None:
+            return
+        if response.get("ok"):
+            self._shown_text = text
+        elif response.get("error_code") == 429:
+            retry_after = response.get("parameters", {}).get("retry_after", 1)
+            self._next_edit_at = time.monotonic() + retry_after
+            logger.warning(f"Telegram edit rate limit, retry after {retry_after} sec")
+        elif "message is not modified" not in response.get("description", ""):
+            logger.error(f"Telegram API error: {response}")
+
+    def update(self, text: str):
+        """Промежуточный текст; лишние обновления пропускаются"""
+        text = text[:TELEGRAM_MESSAGE_LIMIT]
+        now = time.monotonic()
+        if not text.strip() or text == self._shown_text or now < self._next_edit_at:
+            return
+        self._next_edit_at = now + EDIT_INTERVAL
+        self._apply(text)
+
+    def finish(self, text: str) -> bool:
+        """
+        Итоговый текст. Если сообщение ещё не отправлено - обычная отправка с клавиатурой.
+        Возвращает True, если ответ целиком дошёл до Telegram.
+        """
+        if self.message_id is None:
+            return _sent(send_message(self.chat_id, text, self.keyboard))
+        head, tail = text[:TELEGRAM_MESSAGE_LIMIT], text[TELEGRAM_MESSAGE_LIMIT:]
+        delay = self._next_edit_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        if head != self._shown_text:
+            self._apply(head)
+        delivered = head == self._shown_text
+        if tail:
+            delivered = _sent(send_message(self.chat_id, tail, self.keyboard)) and delivered
+        return delivered
+
+
+BOOKING_STEPS = ["name", "phone", "service", "date", "master", "comment"]
+BOOKING_PROMPTS = {
+    "name": "Пожалуйста, введите ваше имя:",
+    "phone": "Введите ваш номер телефона:",
+    "service": "Какую услугу хотите получить?",
+    "date": "Когда вам удобно прийти? (например, завтра в 14:00)",
+    "master": "Выберите категорию мастера:\n1. Тренер\n2. Персональный тренер\n3. Ведущий тренер\n4. Эксперт",
+    "comment": "Если хотите, добавьте комментарий (например, особые пожелания). Можно оставить пустым:"
+}
+BOOKING_RETRY_PROMPTS = {
+    "phone": "Не удалось распознать номер. Введите телефон, например: +7 999 123-45-67",
+    "date": "Не удалось распознать дату или она уже прошла. Укажите день и время, "
+            "например: «завтра в 14:00» или «25.12 в 18:30»",
+    "master": "Выберите категорию из списка (можно номером):\n1. Тренер\n2. Персональный тренер\n"
+              "3. Ведущий тренер\n4. Эксперт"
+}
+# Разбор ответа на шаг: None - ответ не распознан, шаг нужно повторить
+BOOKING_PARSERS = {
+    "phone": parse_phone,
+    "date": normalize_datetime,
+    "master": parse_master_category
+}
+
+
+def start_booking(chat_id: int, intro: str = None, prefill: dict = None):
+    """Запуск пошаговой записи; поля из prefill уже известны и не спрашиваются"""
+    user_states[chat_id] = {"mode": "booking", "step": None, "data": dict(prefill or {})}
+    ask_next_booking_step(chat_id, intro)
+
+
+def ask_next_booking_step(chat_id: int, intro: str = None) -> bool:
+    """Переход к первому незаполненному шагу записи; False - все поля заполнены"""
+    state = user_states[chat_id]
+    for step in BOOKING_STEPS:
+        if step not in state["data"]:
+            state["step"] = step
+            prompt = BOOKING_PROMPTS[step]
+            send_message(chat_id, f"{intro} {prompt}" if intro else prompt)
+            return True
+    return False
+
+
+def handle_booking_step(chat_id: int, state: dict, text: str):
+    """Ответ пользователя на текущий шаг записи"""
+    step = state["step"]
+    data = state["data"]
+    parser = BOOKING_PARSERS.get(step)
+    if parser:
+        value = parser(text)
+        if value is None:
+            send_message(chat_id, BOOKING_RETRY_PROMPTS[step])
+            return
+        data[step] = value
+    elif step == "comment":
+        data["comment"] = text if text.strip() else ""
+    else:
+        data[step] = text
+    if step not in ("name", "comment"):
+        # "Массаж завтра в 18:00" заполняет сразу услугу и дату
+        for key, value in extract_slots(text).items():
+            data.setdefault(key, value)
+
+    # После переспроса поля из validate_booking комментарий уже есть - сразу к сохранению
+    if ask_next_booking_step(chat_id):
+        return
+
+    errors = validate_booking(data)
+    if errors:
+        # Например, выбранное время успело пройти, пока заполнялась заявка
+        for field in errors:
+            data.pop(field, None)
+        ask_next_booking_step(chat_id, f"Проверьте данные: {'; '.join(errors.values())}.")
+        return
+    try:
+        booking_info = save_booking_data(
+            data["name"],
+            data["phone"],
+            data["service"],
+            data["date"],
+            data["master"],
+            data["comment"]
+        )
+        send_message(chat_id, booking_info, MAIN_KEYBOARD)
+        logger.info(f"Booking saved: {data}")
+    except Exception as e:
+        logger.error(f"Booking error: {e}")
+        send_message(chat_id,
+                     "Заявка принята! Мы свяжемся с вами для подтверждения.",
+                     MAIN_KEYBOARD)
+    finally:
+        user_states.pop(chat_id, None)
+
+
 def save_booking_data(name, phone, service, datetime, master_category, comments=None):
     booking_data = {
         "name": name,
@@ -90,7 +351,7 @@ def save_booking_data(name, phone, service, datetime, master_category, comments=
 Мастер: {booking_data['master']}
 Комментарий: {booking_data['comment']}
         """
-        send_admin_notification(admin_text.strip())
+        notify_admin(admin_text.strip())
 
         # Сообщение пользователю
         return f"""
@@ -113,9 +374,21 @@ def save_booking_data(name, phone, service, datetime, master_category, comments=
 # ROUTES
 # ==============================
 
+def enqueue_telegram_message(chat_id: int, text: str):
+    """
+    Сообщения одного чата обрабатываются строго по порядку.
+    Полоса выбирается после предыдущих сообщений чата: они могут сменить режим
+    """
+    scheduler.submit(lambda: telegram_lane(chat_id, text), handle_telegram_message, chat_id, text,
+                     key=chat_id)
+
+
 @app.route("/", methods=["POST"])
 def webhook():
-    """Webhook для Telegram"""
+    """Webhook для Telegram: сообщение ставится в очередь своей полосы, Telegram получает ответ сразу"""
+    if draining.is_set():
+        # Telegram повторит доставку update после перезапуска
+        return "shutting down", 503
     try:
         data = request.get_json()
         logger.info(f"Telegram update: {data}")
@@ -126,109 +399,167 @@ def webhook():
         message = data["message"]
         chat_id = message["chat"]["id"]
         text = message.get("text", "")
+        enqueue_telegram_message(chat_id, text)
+        return "ok"
 
-        # Секретная команда
-        if text == SECRET_COMMAND:
-            send_message(chat_id, "~")
-            return "ok"
+    except Exception as e:
+        logger.error(f"Webhook error: {e}")
+        return str(e), 500
 
-        # Старт
-        if text == "/start":
-            send_message(chat_id,
-                         "Здравствуйте! Я ассистент World Class. Выберите действие:",
-                         MAIN_KEYBOARD)
-            return "ok"
 
-        # Быстрая запись
-        if text == "Быстрая запись":
-            user_states[chat_id] = {"mode": "booking", "step": "name", "data": {}}
-            send_message(chat_id, "Пожалуйста, введите ваше имя:")
-            return "ok"
+def telegram_lane(chat_id: int, text: str) -> str:
+    """Полоса для сообщения: в consult попадают только вопросы к ассистенту"""
+    state = user_states.get(chat_id)
+    if text in (SECRET_COMMAND, "/start", "Быстрая запись", "Консультация"):
+        return "booking"
+    if state and state["mode"] == "consult" and classify_intent(text) == QUESTION:
+        return "consult"
+    return "booking"
 
-        # Консультация
-        if text == "Консультация":
-            user_states[chat_id] = {"mode": "consult"}
-            send_message(chat_id, "Задайте ваш вопрос по услугам клуба:")
-            return "ok"
 
-        # Работаем с состояниями
-        if chat_id in user_states:
-            state = user_states[chat_id]
-
-            if state["mode"] == "consult":
-                try:
-                    ai_response = get_openai_assistant_reply(chat_id, text)
-                    send_message(chat_id, ai_response, MAIN_KEYBOARD)
-                except Exception as e:
-                    logger.error(f"AI error: {e}")
-                    send_message(chat_id,
-                                 "Извините, произошла ошибка. Попробуйте позже.",
-                                 MAIN_KEYBOARD)
-
-            elif state["mode"] == "booking":
-                step = state["step"]
-                if step == "name":
-                    state["data"]["name"] = text
-                    state["step"] = "phone"
-                    send_message(chat_id, "Введите ваш номер телефона:")
-                elif step == "phone":
-                    state["data"]["phone"] = text
-                    state["step"] = "service"
-                    send_message(chat_id, "Какую услугу хотите получить?")
-                elif step == "service":
-                    state["data"]["service"] = text
-                    state["step"] = "date"
-                    send_message(chat_id, "Когда вам удобно прийти? (например, завтра в 14:00)")
-                elif step == "date":
-                    state["data"]["date"] = text
-                    state["step"] = "master"
-                    send_message(chat_id,
-                                 "Выберите категорию мастера:\n1. Тренер\n2. Персональный тренер\n3. Ведущий тренер\n4. Эксперт")
-                elif step == "master":
-                    state["data"]["master"] = text
-                    state["step"] = "comment"
-                    send_message(chat_id,
-                                 "Если хотите, добавьте комментарий (например, особые пожелания). Можно оставить пустым:")
-                elif step == "comment":
-                    state["data"]["comment"] = text if text.strip() else ""
-                    try:
-                        booking_info = save_booking_data(
-                            state["data"]["name"],
-                            state["data"]["phone"],
-                            state["data"]["service"],
-                            state["data"]["date"],
-                            state["data"]["master"],
-                            state["data"]["comment"]
-                        )
-                        send_message(chat_id, booking_info, MAIN_KEYBOARD)
-                        logger.info(f"Booking saved: {state['data']}")
-                    except Exception as e:
-                        logger.error(f"Booking error: {e}")
-                        send_message(chat_id,
-                                     "Заявка принята! Мы свяжемся с вами для подтверждения.",
-                                     MAIN_KEYBOARD)
-                    finally:
-                        user_states.pop(chat_id, None)
+@traced("telegram-message")
+def handle_telegram_message(chat_id: int, text: str):
+    """Обработка сообщения Telegram (выполняется в потоке полосы планировщика)"""
+    try:
+        _handle_telegram_message(chat_id, text)
+    finally:
+        # Время последней активности: по нему janitor сбрасывает брошенные состояния
+        state = user_states.get(chat_id)
+        if state is not None:
+            state["updated_at"] = time.time()
+
+
+def _handle_telegram_message(chat_id: int, text: str):
+    # Секретная команда
+    if text == SECRET_COMMAND:
+        send_message(chat_id, "~")
+        return
+
+    # Старт
+    if text == "/start":
+        send_message(chat_id,
+                     "Здравствуйте! Я ассистент World Class. Выберите действие:",
+                     MAIN_KEYBOARD)
+        return
+
+    # Быстрая запись
+    if text == "Быстрая запись":
+        start_booking(chat_id)
+        return
+
+    # Консультация
+    if text == "Консультация":
+        user_states[chat_id] = {"mode": "consult"}
+        send_message(chat_id, "Задайте ваш вопрос по услугам клуба:")
+        return
+
+    # Работаем с состояниями
+    if chat_id in user_states:
+        state = user_states[chat_id]
+
+        if state["mode"] == "consult":
+            # Очевидные запись и приветствие обрабатываются без ассистента
+            intent = classify_intent(text)
+            if intent == BOOKING:
+                logger.info(f"Intent router: booking request from {chat_id}")
+                start_booking(chat_id, "Давайте оформим запись!", extract_slots(text))
+                return
+            if intent == GREETING:
+                send_message(chat_id,
+                             "Здравствуйте! Задайте ваш вопрос по услугам клуба "
+                             "или выберите «Быстрая запись».",
+                             MAIN_KEYBOARD)
+                return
+            try:
+                with TypingIndicator(chat_id):
+                    # Checkpoint run снимается только после отправки ответа
+                    if STREAM_REPLIES:
+                        reply = ProgressiveReply(chat_id, MAIN_KEYBOARD)
+                        ai_response = stream_openai_assistant_reply(chat_id, text, reply.update)
+                        run_ids = take_undelivered_runs()
+                        confirm_delivery(run_ids, reply.finish(ai_response))
+                    else:
+                        ai_response = get_openai_assistant_reply(chat_id, text)
+                        run_ids = take_undelivered_runs()
+                        confirm_delivery(run_ids, _sent(send_message(chat_id, ai_response, MAIN_KEYBOARD)))
+            except Exception as e:
+                logger.error(f"AI error: {e}")
+                send_message(chat_id,
+                             "Извините, произошла ошибка. Попробуйте позже.",
+                             MAIN_KEYBOARD)
+
+        elif state["mode"] == "booking":
+            handle_booking_step(chat_id, state, text)
 
+    else:
+        send_message(chat_id, "Воспользуйтесь командой /start", MAIN_KEYBOARD)
+
+
+def _count_website_chat(key: str):
+    with web_replies_lock:
+        website_chat_stats[key] += 1
+
+
+def reply_once(user_id: str, message_id: str, produce) -> str:
+    """
+    Ответ на сообщение виджета ровно один раз: повтор с тем же message_id
+    (ретрай после обрыва соединения) ждёт и получает ответ первого запроса
+    """
+    if not message_id:
+        return produce()
+    key = (user_id, message_id)
+    with web_replies_lock:
+        entry = web_replies.get(key)
+        is_first = entry is None
+        if is_first:
+            entry = {"done": threading.Event(), "response": None}
+            web_replies[key] = entry
+            while len(web_replies) > WEB_DEDUPE_SIZE:
+                web_replies.popitem(last=False)
         else:
-            send_message(chat_id, "Воспользуйтесь командой /start", MAIN_KEYBOARD)
+            website_chat_stats["duplicates"] += 1
+    if not is_first:
+        logger.info(f"Duplicate website message {message_id} from {user_id}")
+        entry["done"].wait()
+        return entry["response"] or "Извините, произошла ошибка при обработке вашего запроса."
+    try:
+        entry["response"] = produce()
+        return entry["response"]
+    except Exception:
+        # Следующий повтор должен обработать сообщение заново
+        with web_replies_lock:
+            web_replies.pop(key, None)
+        raise
+    finally:
+        entry["done"].set()
 
-        return "ok"
 
-    except Exception as e:
-        logger.error(f"Webhook error: {e}")
-        return str(e), 500
+def _website_chat_run(user_message: str, user_id: str):
+    return chat_with_assistant(user_message, user_id), take_undelivered_runs()
+
+
+def website_chat_reply(user_message: str, user_id: str) -> str:
+    """Ответ виджету; checkpoint run снимается, когда ответ передан в HTTP-ответ"""
+    response_text, run_ids = scheduler.submit(
+        "web", traced("website-chat-run")(_website_chat_run), user_message, user_id
+    ).result()
+    confirm_delivery(run_ids, True)
+    return response_text
 
 
 @app.route("/website-chat", methods=["POST", "OPTIONS"])
+@traced("website-chat")
 def website_chat():
     """Чат-виджет для сайта"""
     if request.method == "OPTIONS":
+        _count_website_chat("options")
         response = jsonify({"status": "ok"})
         response.headers.add("Access-Control-Allow-Origin", "*")
         response.headers.add("Access-Control-Allow-Headers", "Content-Type, ngrok-skip-browser-warning")
         response.headers.add("Access-Control-Allow-Methods", "POST, OPTIONS")
+        response.headers.add("Access-Control-Max-Age", str(CORS_MAX_AGE))
         return response
+    _count_website_chat("post")
 
     try:
         data = request.get_json() or {}
@@ -236,12 +567,22 @@ def website_chat():
         if not user_message:
             return jsonify({"status": "error", "message": "No message provided"}), 400
 
+        if draining.is_set():
+            return jsonify({"status": "error", "message": "Сервер перезапускается, повторите запрос через минуту"}), 503
+
         user_id = data.get("user_id", f"web_user_{request.remote_addr}")
-        response_text = chat_with_assistant(user_message, user_id)
+        with pending_web_replies_lock:
+            pending = pending_web_replies.pop(user_id, [])
+        # Run выполняется в полосе web: число одновременных run'ов виджета ограничено
+        response_text = reply_once(
+            user_id, data.get("message_id"),
+            lambda: website_chat_reply(user_message, user_id)
+        )
 
         result = {
             "status": "success",
             "response": response_text,
+            "pending": pending,
             "message_id": data.get("message_id", ""),
             "timestamp": str(time.time())
         }
@@ -261,12 +602,140 @@ def health():
     return "ok"
 
 
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Готовность зависимостей (OpenAI, Google Sheets, Telegram)"""
+    is_ready = dependencies_ready() and not draining.is_set()
+    result = {"ready": is_ready, "draining": draining.is_set(), "dependencies": dependency_status}
+    return jsonify(result), (200 if is_ready else 503)
+
+
+def _metrics(detailed: bool) -> dict:
+    return {
+        "openai_breaker": openai_breaker.snapshot(),
+        "openai_deadlines": dict(deadline_stats),
+        "openai_usage": usage_tracker.snapshot(include_users=detailed),
+        "model_tiers": model_router.snapshot(),
+        "website_chat": dict(website_chat_stats),
+        "scheduler": scheduler.snapshot(),
+        "telegram_webhook": webhook_reconciler.snapshot(include_urls=detailed),
+        "janitor": thread_janitor.snapshot()
+    }
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Служебные метрики для мониторинга (без идентификаторов пользователей и адреса туннеля)"""
+    return jsonify(_metrics(detailed=False))
+
+
+def _check_debug_token():
+    if not DEBUG_TOKEN:
+        abort(404)
+    if request.headers.get("X-Debug-Token") != DEBUG_TOKEN:
+        abort(403)
+
+
+@app.route("/debug/profile", methods=["POST"])
+def debug_profile():
+    """
+    Сэмплирующий профайлер: ?action=start[&interval_ms=5] / ?action=stop.
+    stop возвращает folded stacks для flamegraph.pl / speedscope.
+    """
+    _check_debug_token()
+    action = request.args.get("action")
+    if action == "start":
+        interval = float(request.args.get("interval_ms", "5")) / 1000
+        if not profiler.start(interval):
+            return jsonify({"status": "error", "message": "Profiler already running"}), 409
+        return jsonify({"status": "started"})
+    if action == "stop":
+        if not profiler.running:
+            return jsonify({"status": "error", "message": "Profiler is not running"}), 409
+        folded = profiler.stop()
+        return folded, 200, {"Content-Type": "text/plain; charset=utf-8"}
+    return jsonify({"status": "error", "message": "action must be start or stop"}), 400
+
+
+@app.route("/debug/metrics", methods=["GET"])
+def debug_metrics():
+    """Метрики вместе с расходом токенов по пользователям и адресами туннеля и вебхука"""
+    _check_debug_token()
+    return jsonify(_metrics(detailed=True))
+
+
+@app.route("/debug/traces", methods=["GET", "POST"])
+def debug_traces():
+    """Последние трейсы запросов; POST ?enable=1/0 включает/выключает трассировку"""
+    _check_debug_token()
+    if request.method == "POST":
+        tracing.set_tracing(request.args.get("enable") == "1")
+    return jsonify({"enabled": tracing.tracing_enabled, "traces": list(tracing.recent_traces)})
+
+
 @app.route("/get_webhook_url", methods=["GET"])
 def get_current_url():
     url = get_webhook_url()
     return jsonify({"url": url}) if url else (jsonify({"error": "URL not available"}), 500)
 
 
+# ==============================
+# ПЕРЕЗАПУСК БЕЗ ПОТЕРИ ОТВЕТОВ
+# ==============================
+
+def deliver_resumed_reply(checkpoint: dict, reply: str) -> bool:
+    """Доставка ответа run, досчитанного после перезапуска"""
+    if checkpoint["channel"] == "web":
+        with pending_web_replies_lock:
+            pending_web_replies.setdefault(checkpoint["user_id"], []).append(reply)
+        return True
+    return _sent(send_message(checkpoint["user_id"], reply, MAIN_KEYBOARD))
+
+
+def startup():
+    initialize_dependencies()
+    resume_pending_runs(deliver_resumed_reply)
+    queued = run_checkpoints.load_messages()
+    if queued:
+        logger.info(f"Processing {len(queued)} Telegram messages queued before the restart")
+    for chat_id, text in queued:
+        enqueue_telegram_message(chat_id, text)
+    thread_janitor.start()
+    # Вебхук сверяется только при готовых зависимостях, как и в run_bot.py
+    if dependencies_ready():
+        webhook_reconciler.start()
+    else:
+        logger.warning("Webhook reconciler not started: dependencies are not ready")
+
+
+def shutdown(signum, frame):
+    """SIGTERM/SIGINT: перестаём брать новые запросы и ждём активные run'ы"""
+    if draining.is_set():
+        return
+    draining.set()
+    webhook_reconciler.stop()
+    thread_janitor.stop()
+    drain_deadline = time.monotonic() + SHUTDOWN_DRAIN_SECONDS
+    active = run_checkpoints.active_count()
+    logger.info(f"Shutdown: waiting for queued messages and {active} active runs "
+                f"(up to {SHUTDOWN_DRAIN_SECONDS:.0f} sec)")
+    if not scheduler.wait_idle(SHUTDOWN_DRAIN_SECONDS):
+        # Не начатые сообщения Telegram сохраняются и обрабатываются после перезапуска
+        queued = []
+        for func, args in scheduler.cancel_queued():
+            if func is handle_telegram_message:
+                queued.append(args)
+            else:
+                logger.warning(f"Shutdown: dropped queued task {getattr(func, '__name__', func)}{args}")
+        run_checkpoints.save_messages(queued)
+        logger.warning(f"Shutdown: scheduler lanes are not empty, saved {len(queued)} queued Telegram messages")
+    if not run_checkpoints.wait_idle(max(0.0, drain_deadline - time.monotonic())):
+        logger.warning(f"Shutdown: {run_checkpoints.active_count()} runs left, they will be resumed on next start")
+    run_checkpoints.save_states(user_states)
+    logger.info(f"Shutdown: saved {len(user_states)} user states")
+    sys.exit(0)
+
+
 # ==============================
 # MAIN
 # ==============================
@@ -276,18 +745,18 @@ if __name__ == "__main__":
         print("🚀 ЗАПУСК ПРИЛОЖЕНИЯ")
         print("=" * 50)
 
-        print("1️⃣ Инициализация OpenAI Assistant API...")
-        if not initialize_openai():
-            print("⚠️ OpenAI Assistant API не инициализирован.")
+        user_states.update(run_checkpoints.load_states())
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
 
-        print("2️⃣ Инициализация Google Sheets API...")
-        initialize_sheets()
+        print("1️⃣ Инициализация OpenAI, Google Sheets и Telegram (параллельно, см. /ready)...")
+        threading.Thread(target=startup, name="dependency-init", daemon=True).start()
 
-        print("3️⃣ Запуск Flask сервера...")
+        print("2️⃣ Запуск Flask сервера...")
         print("=" * 50)
         print("🎯 СИСТЕМА ЗАПУЩЕНА!")
         print(f"📡 Flask API: http://localhost:5000")
-        print(f"🤖 Telegram bot token: {BOT_TOKEN[:10]}...")
+        print(f"🤖 Telegram bot token: {(BOT_TOKEN or '')[:10]}...")
         print("=" * 50)
 
         app.run(host="0.0.0.0", port=5000, debug=False, threaded=True)
@@ -0,0 +1,181 @@
+import os
+import re
+import json
+import threading
+import time
+import logging
+from collections import deque, OrderedDict
+from dotenv import load_dotenv
+from intent_router import classify_intent, BOOKING
+from slot_parser import extract_slots
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+MODEL_ROUTING_ENABLED = os.getenv('MODEL_ROUTING_ENABLED', '1') == '1'
+MODEL_TIERS_FILE = os.getenv(
+    'MODEL_TIERS_FILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_tiers.json')
+)
+FAST = 'fast'
+FULL = 'full'
+BUDGET = 'budget'  # пользователи сверх дневного лимита (см. usage_tracker)
+LATENCY_WINDOW = 500
+# После записи или сложного вопроса диалог остаётся на full столько минут с последнего такого сообщения:
+# ответы "Анна", "да", "завтра в 14:00" сами по себе короткие
+FULL_TIER_STICKY_MINUTES = float(os.getenv('FULL_TIER_STICKY_MINUTES', '30'))
+STICKY_CONVERSATIONS = 10000
+
+# Конфигурация по умолчанию, если model_tiers.json нет.
+# model: None - модель, настроенная у ассистента. Цены - $ за 1M токенов.
+DEFAULT_CONFIG = {
+    'default_tier': FULL,
+    'tiers': {
+        FAST: {'model': 'gpt-4o-mini', 'max_words': 12, 'price_per_1m': {'prompt': 0.15, 'completion': 0.6}},
+        FULL: {'model': None, 'price_per_1m': {'prompt': 2.5, 'completion': 10.0}}
+    }
+}
+
+# Запись, перенос, отмена - всегда полная модель: там вызов save_booking_data и уточнения
+_BOOKING_WORDS_RE = re.compile(r'запис|заброн|бронир|перенес|перенест|отмен|оформ')
+
+
+def _percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def load_config(path: str = MODEL_TIERS_FILE) -> dict:
+    if not os.path.exists(path):
+        return DEFAULT_CONFIG
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        if FULL not in config.get('tiers', {}):
+            raise ValueError(f"tier '{FULL}' is required")
+        return config
+    except Exception as e:
+        logger.error(f"Error loading model tiers from {path}: {e}; using defaults")
+        return DEFAULT_CONFIG
+
+
+class ModelRouter:
+    """
+    Выбор модели для run по сложности сообщения, без обращения к OpenAI.
+    fast - короткий одиночный вопрос (часы работы, адрес, цена);
+    full - запись, длинные и составные вопросы и следующие за ними реплики
+    того же диалога (см. FULL_TIER_STICKY_MINUTES).
+    Модель передаётся в runs.create как override, поэтому настройки
+    ассистента (промпт, инструменты) остаются общими.
+    """
+
+    def __init__(self, config: dict = None, enabled: bool = MODEL_ROUTING_ENABLED):
+        config = config or load_config()
+        self.enabled = enabled
+        self.tiers = config['tiers']
+        self.default_tier = config.get('default_tier', FULL)
+        self.sticky_seconds = FULL_TIER_STICKY_MINUTES * 60
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._full_until = OrderedDict()  # ключ диалога -> time.monotonic(), до которого он на full
+
+    def _classify_message(self, text: str) -> str:
+        words = text.split()
+        if not words:
+            return self.default_tier
+        if classify_intent(text) == BOOKING or _BOOKING_WORDS_RE.search(text):
+            return FULL
+        # Телефон, дата или категория мастера - ответ на вопрос формы записи
+        if extract_slots(text):
+            return FULL
+        # Несколько вопросов в одном сообщении - составной запрос
+        if text.count('?') > 1 or len(words) > self.tiers[FAST].get('max_words', 12):
+            return FULL
+        return FAST
+
+    def classify(self, message: str, conversation=None) -> str:
+        """Уровень для сообщения; conversation - ключ диалога (канал, пользователь) или None"""
+        if not self.enabled or FAST not in self.tiers:
+            return self.default_tier
+        tier = self._classify_message((message or '').lower().replace('ё', 'е'))
+        if conversation is None:
+            return tier
+        now = time.monotonic()
+        with self._lock:
+            if tier == FULL:
+                self._full_until[conversation] = now + self.sticky_seconds
+                self._full_until.move_to_end(conversation)
+                while len(self._full_until) > STICKY_CONVERSATIONS:
+                    self._full_until.popitem(last=False)
+            elif self._full_until.get(conversation, 0) > now:
+                tier = FULL
+            else:
+                self._full_until.pop(conversation, None)
+        return tier
+
+    def run_options(self, tier: str) -> dict:
+        """Параметры runs.create для уровня; пусто - модель ассистента"""
+        model = self.tiers.get(tier, {}).get('model')
+        return {'model': model} if model else {}
+
+    def _tier_stats(self, tier: str) -> dict:
+        return self._stats.setdefault(tier, {
+            'runs': 0,
+            'errors': 0,
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+            'cost_usd': 0.0,
+            'latency': deque(maxlen=LATENCY_WINDOW)
+        })
+
+    def record_run(self, tier: str, seconds: float, ok: bool):
+        with self._lock:
+            stats = self._tier_stats(tier)
+            stats['runs'] += 1
+            if not ok:
+                stats['errors'] += 1
+            stats['latency'].append(seconds)
+
+    def record_usage(self, tier: str, model: str, usage):
+        """Токены и оценка стоимости run (usage - объект run.usage)"""
+        if usage is None:
+            return
+        prompt_tokens = usage.prompt_tokens or 0
+        completion_tokens = usage.completion_tokens or 0
+        # Бюджетный путь и модель ассистента считаются по ценам уровня, чья модель совпала
+        prices = next(
+            (config.get('price_per_1m', {}) for config in self.tiers.values() if config.get('model') == model),
+            self.tiers.get(tier, self.tiers[FULL]).get('price_per_1m', {})
+        )
+        cost = (prompt_tokens * prices.get('prompt', 0) + completion_tokens * prices.get('completion', 0)) / 1e6
+        with self._lock:
+            stats = self._tier_stats(tier)
+            stats['prompt_tokens'] += prompt_tokens
+            stats['completion_tokens'] += completion_tokens
+            stats['cost_usd'] += cost
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            tiers = {}
+            for tier, stats in self._stats.items():
+                latency = list(stats['latency'])
+                tiers[tier] = {
+                    'model': self.tiers.get(tier, {}).get('model'),
+                    'runs': stats['runs'],
+                    'errors': stats['errors'],
+                    'latency_p50_sec': round(_percentile(latency, 0.5), 2),
+                    'latency_p95_sec': round(_percentile(latency, 0.95), 2),
+                    'prompt_tokens': stats['prompt_tokens'],
+                    'completion_tokens': stats['completion_tokens'],
+                    'cost_usd': round(stats['cost_usd'], 4),
+                    'cost_per_run_usd': round(stats['cost_usd'] / stats['runs'], 5) if stats['runs'] else 0.0
+                }
+            now = time.monotonic()
+            sticky = sum(1 for until in self._full_until.values() if until > now)
+            return {'enabled': self.enabled, 'sticky_full_conversations': sticky, 'tiers': tiers}
+
+
+model_router = ModelRouter()
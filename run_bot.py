@@ -1,23 +1,50 @@
 import subprocess
+import sys
 import time
 import requests
 import os
 from dotenv import load_dotenv
-from url_manager import save_webhook_url
+from url_manager import get_ngrok_url, save_webhook_url, set_telegram_webhook
 
 # Загружаем переменные окружения
 load_dotenv()
 
-def get_ngrok_url():
-    try:
-        response = requests.get("http://localhost:4040/api/tunnels")
-        url = response.json()["tunnels"][0]["public_url"]
-        if url.startswith("https://"):
+FLASK_READY_URL = "http://localhost:5000/ready"
+NGROK_TIMEOUT = 30  # секунд на появление туннеля
+READY_TIMEOUT = 60  # секунд на готовность зависимостей
+POLL_INTERVAL = 0.25
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "30")) + 5
+
+def wait_for_ngrok(timeout: float = NGROK_TIMEOUT):
+    """Опрашивает API ngrok, пока не появится HTTPS-туннель"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        url = get_ngrok_url()
+        if url:
             return url
-        return None
-    except Exception as e:
-        print(f"Ошибка при получении URL ngrok: {e}")
-        return None
+        time.sleep(POLL_INTERVAL)
+    return None
+
+def wait_for_ready(flask_process, timeout: float = READY_TIMEOUT):
+    """
+    Опрашивает /ready, пока Flask не сообщит о готовности всех зависимостей.
+    Возвращает последний ответ /ready (или None, если сервер так и не ответил).
+    """
+    deadline = time.monotonic() + timeout
+    status = None
+    while time.monotonic() < deadline and flask_process.poll() is None:
+        try:
+            response = requests.get(FLASK_READY_URL, timeout=2)
+            status = response.json()
+            if response.status_code == 200:
+                return status
+            # Все зависимости отработали, но часть с ошибкой - ждать дальше нет смысла
+            if all(dep["state"] != "pending" for dep in status["dependencies"].values()):
+                return status
+        except requests.RequestException:
+            pass
+        time.sleep(POLL_INTERVAL)
+    return status
 
 def run_ngrok():
     """Запускает ngrok туннель"""
@@ -26,57 +53,76 @@ def run_ngrok():
 
 def run_flask():
     """Запускает Flask сервер"""
-    return subprocess.Popen(["python", "main.py"])
+    return subprocess.Popen([sys.executable, "main.py"])
+
+def set_webhook(url):
+    if set_telegram_webhook(url, os.getenv('TELEGRAM_BOT_TOKEN')):
+        print("✅ Webhook успешно обновлен")
+    else:
+        print("❌ Ошибка обновления webhook")
 
 def main():
+    launch_start = time.perf_counter()
     print("🚀 ЗАПУСК СИСТЕМЫ World Class")
     print("=" * 40)
     print("1️⃣ Запускаем ngrok...")
     ngrok_process = subprocess.Popen(
-        ["ngrok", "http", "5000"], 
+        ["ngrok", "http", "5000"],
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
     )
-    print("2️⃣ Ждём запуска ngrok (3 сек)...")
-    time.sleep(3)
-    print("3️⃣ Ждём готовности ngrok (2 сек)...")
-    time.sleep(2)
-    print("4️⃣ Получаем ngrok URL...")
-    url = get_ngrok_url()
+    print("2️⃣ Запускаем Flask сервер (зависимости инициализируются параллельно)...")
+    print("(логи Flask будут показываться ниже)")
+    flask_process = run_flask()
+
+    stage_start = time.perf_counter()
+    url = wait_for_ngrok()
     if url:
-        print(f"🌐 Ngrok URL: {url}")
+        print(f"⏱️ ngrok готов за {time.perf_counter() - stage_start:.2f} сек: {url}")
         save_webhook_url(url)
-        print("5️⃣ Обновляем webhook...")
-        try:
-            bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
-            response = requests.post(
-                f"https://api.telegram.org/bot{bot_token}/setWebhook",
-                json={"url": url}
-            )
-            if response.status_code == 200:
-                print("✅ Webhook успешно обновлен")
-            else:
-                print(f"❌ Ошибка обновления webhook: {response.text}")
-        except Exception as e:
-            print(f"❌ Ошибка при обновлении webhook: {e}")
     else:
         print("❌ Не удалось получить URL ngrok")
+
+    print("3️⃣ Ждём готовности зависимостей (/ready)...")
+    stage_start = time.perf_counter()
+    status = wait_for_ready(flask_process)
+    if status:
+        for name, dep in status["dependencies"].items():
+            seconds = f"{dep['seconds']:.2f} сек" if dep["seconds"] is not None else "—"
+            mark = "✅" if dep["state"] == "ready" else "❌"
+            print(f"⏱️ {mark} {name}: {dep['state']} ({seconds})")
+    is_ready = bool(status and status["ready"])
+    print(f"⏱️ /ready {'готов' if is_ready else 'не готов'} за {time.perf_counter() - stage_start:.2f} сек")
+
+    if url and is_ready:
+        print("4️⃣ Обновляем webhook...")
+        stage_start = time.perf_counter()
+        set_webhook(url)
+        print(f"⏱️ webhook за {time.perf_counter() - stage_start:.2f} сек")
+    elif url:
+        print("⚠️ Webhook не обновлён: не все зависимости готовы")
+
     print("\n" + "=" * 50)
-    print("🎯 СИСТЕМА ГОТОВА К РАБОТЕ!")
+    print(f"🎯 СИСТЕМА {'ГОТОВА К РАБОТЕ' if is_ready else 'ЗАПУЩЕНА С ОШИБКАМИ'}! "
+          f"(за {time.perf_counter() - launch_start:.2f} сек)")
     print("=" * 50)
-    print(f"📡 Flask будет запущен на: http://localhost:5000")
+    print("📡 Flask запущен на: http://localhost:5000")
     if url:
         print(f"🌐 Внешний URL: {url}")
         print(f"🎯 Для виджета Tilda: {url}/website-chat")
     print("=" * 50)
-    print("6️⃣ Запускаем Flask сервер...")
-    print("(логи Flask будут показываться ниже)")
-    print("-" * 50)
     try:
-        import main
+        flask_process.wait()
     except KeyboardInterrupt:
         print("\n🛑 Завершаем работу...")
+    finally:
+        # Flask дорабатывает активные run'ы (SHUTDOWN_DRAIN_SECONDS), туннель нужен ему до конца
+        flask_process.terminate()
+        try:
+            flask_process.wait(timeout=SHUTDOWN_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            flask_process.kill()
         ngrok_process.terminate()
         print("✅ Системы остановлены")
 
@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import threading
+import logging
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+RUN_CHECKPOINT_FILE = os.getenv('RUN_CHECKPOINT_FILE', 'run_checkpoints.json')
+
+
+class RunCheckpoints:
+    """
+    Активные run'ы ассистента, незавершённые записи и не обработанные до
+    остановки сообщения Telegram, сохранённые на диск.
+    Запись о run живёт от runs.create до доставки ответа (remove после
+    отправки в Telegram / виджет); всё, что осталось в файле при старте, -
+    run'ы прошлого процесса, ответ на которые не дошёл.
+    """
+
+    def __init__(self, path: str = RUN_CHECKPOINT_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._runs = {}  # run_id -> checkpoint текущего процесса
+        self._pending = {}  # run_id -> checkpoint прошлого процесса
+        self._states = {}
+        self._messages = []  # [chat_id, text] - сообщения Telegram, не обработанные до остановки
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading run checkpoints: {e}")
+            return
+        self._pending = saved.get('runs', {})
+        self._states = saved.get('user_states', {})
+        self._messages = saved.get('telegram_messages', [])
+        if self._pending or self._states or self._messages:
+            logger.info(f"Loaded {len(self._pending)} unfinished runs, {len(self._states)} user states "
+                        f"and {len(self._messages)} queued Telegram messages")
+
+    def _save(self):
+        """Атомарная запись файла (вызывается под self._lock)"""
+        data = {'runs': {**self._pending, **self._runs}, 'user_states': self._states,
+                'telegram_messages': self._messages}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving run checkpoints: {e}")
+
+    def add(self, run_id: str, channel: str, user_id, thread_id: str):
+        with self._lock:
+            self._runs[run_id] = {
+                'run_id': run_id,
+                'channel': channel,
+                'user_id': user_id,
+                'thread_id': thread_id,
+                'started_at': round(time.time(), 3)
+            }
+            self._save()
+
+    def remove(self, run_id: str):
+        with self._lock:
+            if self._runs.pop(run_id, None) is None and self._pending.pop(run_id, None) is None:
+                return
+            self._save()
+            if not self._runs:
+                self._idle.notify_all()
+
+    def defer(self, run_id: str):
+        """Ответ run не доставлен: run досматривается при следующем старте"""
+        with self._lock:
+            checkpoint = self._runs.pop(run_id, None)
+            if checkpoint is None:
+                return
+            self._pending[run_id] = checkpoint
+            self._save()
+            if not self._runs:
+                self._idle.notify_all()
+
+    def pending(self) -> list:
+        """Run'ы, оставшиеся от прошлого запуска"""
+        with self._lock:
+            return list(self._pending.values())
+
+    def active_threads(self) -> set:
+        """Треды, в которых сейчас идут run'ы (текущие и ожидающие восстановления)"""
+        with self._lock:
+            return {checkpoint['thread_id'] for checkpoint in [*self._runs.values(), *self._pending.values()]}
+
+    def active_count(self) -> int:
+        with self._lock:
+            return len(self._runs)
+
+    def wait_idle(self, timeout: float) -> bool:
+        """Ждёт завершения активных run'ов; False - если не успели за timeout"""
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._runs, timeout)
+
+    def save_states(self, user_states: dict):
+        """Сохраняет незавершённые записи и режимы пользователей"""
+        with self._lock:
+            self._states = {str(chat_id): state for chat_id, state in user_states.items()}
+            self._save()
+
+    def load_states(self) -> dict:
+        """Состояния, сохранённые при прошлой остановке; ключи - chat_id Telegram"""
+        with self._lock:
+            states = {int(chat_id): state for chat_id, state in self._states.items()}
+            if self._states:
+                self._states = {}
+                self._save()
+            return states
+
+    def save_messages(self, messages: list):
+        """Сохраняет сообщения Telegram [(chat_id, text)], которые не успели обработать"""
+        with self._lock:
+            self._messages = [[chat_id, text] for chat_id, text in messages]
+            self._save()
+
+    def load_messages(self) -> list:
+        """Сообщения, сохранённые при прошлой остановке, в порядке поступления"""
+        with self._lock:
+            messages = [(chat_id, text) for chat_id, text in self._messages]
+            if self._messages:
+                self._messages = []
+                self._save()
+            return messages
+
+
+run_checkpoints = RunCheckpoints()
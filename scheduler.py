@@ -0,0 +1,183 @@
+import os
+import time
+import queue
+import threading
+import logging
+from collections import deque
+from concurrent.futures import Future
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Полосы и число потоков в каждой: быстрые шаги записи не ждут медленных run'ов ассистента
+LANE_WORKERS = {
+    'booking': int(os.getenv('LANE_BOOKING_WORKERS', '4')),
+    'consult': int(os.getenv('LANE_CONSULT_WORKERS', '8')),
+    'web': int(os.getenv('LANE_WEB_WORKERS', '8')),
+    'admin': int(os.getenv('LANE_ADMIN_WORKERS', '2'))
+}
+LATENCY_WINDOW = 500  # последних задач для перцентилей ожидания
+
+
+def _percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Lane:
+    """Очередь задач с собственным пулом потоков и метриками ожидания"""
+
+    def __init__(self, name: str, workers: int, on_done):
+        self.name = name
+        self.workers = workers
+        self._on_done = on_done
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+        self.active = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self._wait_ms = deque(maxlen=LATENCY_WINDOW)
+        self._run_ms = deque(maxlen=LATENCY_WINDOW)
+
+    def put(self, task: tuple):
+        with self._lock:
+            self.submitted += 1
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"lane-{self.name}-{len(self._threads)}",
+                                          daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            self._queue.put((time.monotonic(), task))
+
+    def _work(self):
+        while True:
+            enqueued_at, (future, func, args, key) = self._queue.get()
+            started = time.monotonic()
+            with self._lock:
+                self.active += 1
+                self._wait_ms.append((started - enqueued_at) * 1000)
+            succeeded = False
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(func(*args))
+                    succeeded = True
+                except Exception as e:
+                    logger.error(f"Lane {self.name} task {getattr(func, '__name__', func)} failed: {e}",
+                                 exc_info=True)
+                    future.set_exception(e)
+            with self._lock:
+                self.active -= 1
+                self._run_ms.append((time.monotonic() - started) * 1000)
+                if succeeded:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+            self._on_done(key)
+
+    def pending(self) -> int:
+        return self._queue.qsize() + self.active
+
+    def queued_tasks(self) -> list:
+        """Задачи в очереди полосы, ещё не взятые потоком"""
+        with self._queue.mutex:
+            return [task for _, task in self._queue.queue]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            wait_ms = list(self._wait_ms)
+            run_ms = list(self._run_ms)
+            return {
+                'workers': self.workers,
+                'queued': self._queue.qsize(),
+                'active': self.active,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'wait_ms_p50': round(_percentile(wait_ms, 0.5), 1),
+                'wait_ms_p95': round(_percentile(wait_ms, 0.95), 1),
+                'wait_ms_max': round(max(wait_ms, default=0), 1),
+                'run_ms_p50': round(_percentile(run_ms, 0.5), 1),
+                'run_ms_p95': round(_percentile(run_ms, 0.95), 1)
+            }
+
+
+class Scheduler:
+    """
+    Распределяет задачи по полосам. Задачи с одним key (chat_id)
+    выполняются строго по очереди: следующая попадает в свою полосу только
+    после завершения предыдущей, не занимая поток ожиданием.
+    Полоса - имя или функция без аргументов, возвращающая имя: она
+    вызывается, когда задача передаётся в полосу, то есть уже после
+    предыдущих задач того же key (например, после смены режима чата).
+    """
+
+    def __init__(self, lane_workers: dict = None):
+        self._lock = threading.Condition()
+        self._keys = {}  # key -> deque ожидающих задач (ключ есть, пока задача по нему выполняется)
+        self.lanes = {
+            name: Lane(name, workers, self._task_done)
+            for name, workers in (lane_workers or LANE_WORKERS).items()
+        }
+
+    def submit(self, lane, func, *args, key=None) -> Future:
+        future = Future()
+        task = (future, func, args, key)
+        with self._lock:
+            if key is not None:
+                if key in self._keys:
+                    self._keys[key].append((lane, task))
+                    return future
+                self._keys[key] = deque()
+        self.lanes[self._resolve_lane(lane)].put(task)
+        return future
+
+    @staticmethod
+    def _resolve_lane(lane) -> str:
+        return lane() if callable(lane) else lane
+
+    def _task_done(self, key):
+        with self._lock:
+            if key is not None:
+                waiting = self._keys.get(key)
+                if waiting:
+                    lane, task = waiting.popleft()
+                    self.lanes[self._resolve_lane(lane)].put(task)
+                else:
+                    self._keys.pop(key, None)
+            self._lock.notify_all()
+
+    def _idle(self) -> bool:
+        return not self._keys and all(lane.pending() == 0 for lane in self.lanes.values())
+
+    def wait_idle(self, timeout: float) -> bool:
+        """Ждёт, пока все полосы опустеют; False - если не успели за timeout"""
+        with self._lock:
+            return self._lock.wait_for(self._idle, timeout)
+
+    def cancel_queued(self) -> list:
+        """
+        Отменяет задачи, которые ещё не начали выполняться (в очередях полос
+        и в ожидании своего key). Возвращает их как [(func, args)].
+        """
+        # Сначала очереди полос: там первая задача key, за ней - ожидающие по key
+        tasks = [task for lane in self.lanes.values() for task in lane.queued_tasks()]
+        with self._lock:
+            tasks.extend(task for waiting in self._keys.values() for _, task in waiting)
+        return [(func, args) for future, func, args, key in tasks if future.cancel()]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waiting_by_key = sum(len(waiting) for waiting in self._keys.values())
+        return {
+            'lanes': {name: lane.snapshot() for name, lane in self.lanes.items()},
+            'waiting_by_chat': waiting_by_key
+        }
+
+
+scheduler = Scheduler()
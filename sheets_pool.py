@@ -0,0 +1,90 @@
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+SHEETS_DISCOVERY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sheets_discovery.json')
+SHEETS_HTTP_TIMEOUT = 30  # сек на HTTP-запрос к Sheets API
+SHEETS_SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+
+
+def _load_discovery_doc():
+    """Локальный урезанный discovery-документ Sheets v4 или None"""
+    try:
+        with open(SHEETS_DISCOVERY_FILE, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError as e:
+        logger.warning(f"Локальный discovery-документ недоступен ({e}), используем встроенный в googleapiclient")
+        return None
+
+
+class SheetsClientPool:
+    """
+    Клиенты Sheets API по одному на поток.
+    Объект сервиса googleapiclient и httplib2.Http под ним не потокобезопасны,
+    поэтому у каждого потока свой AuthorizedHttp со своим соединением.
+    Credentials общие: токен обновляется один раз под общим замком, а не
+    каждым потоком отдельно.
+    """
+
+    def __init__(self, credentials, api_endpoint: str = None):
+        self.credentials = credentials
+        self.api_endpoint = api_endpoint
+        self._discovery_doc = _load_discovery_doc()
+        self._refresh_lock = threading.Lock()
+        self._local = threading.local()
+        self._count_lock = threading.Lock()
+        self.clients_built = 0
+
+    @classmethod
+    def from_service_account_file(cls, credentials_path: str):
+        """Пул по ключу сервисного аккаунта Google (credentials.json)"""
+        if not os.path.exists(credentials_path):
+            raise FileNotFoundError(f"Файл учетных данных Google Sheets не найден: {credentials_path}")
+        from google.oauth2 import service_account
+        credentials = service_account.Credentials.from_service_account_file(
+            credentials_path, scopes=SHEETS_SCOPES
+        )
+        return cls(credentials)
+
+    def _ensure_fresh_credentials(self):
+        # AuthorizedHttp обновил бы токен сам, но параллельно из каждого потока
+        if self.credentials.valid:
+            return
+        with self._refresh_lock:
+            if self.credentials.valid:
+                return
+            import httplib2
+            import google_auth_httplib2
+            self.credentials.refresh(google_auth_httplib2.Request(httplib2.Http(timeout=SHEETS_HTTP_TIMEOUT)))
+            logger.info("Google Sheets credentials refreshed")
+
+    def _build(self):
+        import httplib2
+        import google_auth_httplib2
+        from googleapiclient.discovery import build, build_from_document
+        http = google_auth_httplib2.AuthorizedHttp(
+            self.credentials, http=httplib2.Http(timeout=SHEETS_HTTP_TIMEOUT)
+        )
+        client_options = {'api_endpoint': self.api_endpoint} if self.api_endpoint else None
+        if self._discovery_doc is None:
+            service = build('sheets', 'v4', http=http, static_discovery=True, client_options=client_options)
+        else:
+            # Разбор локального документа, без загрузки полного при старте
+            service = build_from_document(self._discovery_doc, http=http, client_options=client_options)
+        with self._count_lock:
+            self.clients_built += 1
+        logger.info(f"Google Sheets client built for thread {threading.current_thread().name}")
+        return service
+
+    def service(self):
+        """Клиент Sheets текущего потока"""
+        self._ensure_fresh_credentials()
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._local.service = self._build()
+        return service
+
+    def values(self):
+        return self.service().spreadsheets().values()
@@ -0,0 +1,211 @@
+import os
+import re
+from datetime import datetime, timedelta, date, time
+import pytz
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Относительные даты ("завтра", "в пятницу") считаются в часовом поясе клуба
+BOOKING_TIMEZONE = pytz.timezone(os.getenv('BOOKING_TIMEZONE', 'Europe/Moscow'))
+DATE_FORMAT = '%d.%m.%Y'
+DATETIME_FORMAT = '%d.%m.%Y %H:%M'
+
+MASTER_CATEGORIES = ['Тренер', 'Персональный тренер', 'Ведущий тренер', 'Эксперт']
+
+_MONTHS = {
+    'январ': 1, 'феврал': 2, 'март': 3, 'апрел': 4, 'ма': 5, 'июн': 6,
+    'июл': 7, 'август': 8, 'сентябр': 9, 'октябр': 10, 'ноябр': 11, 'декабр': 12
+}
+_MONTH_WORD_RE = '(январ[ья]|феврал[ья]|марта?|апрел[ья]|ма[йя]|июн[ья]|июл[ья]|августа?|сентябр[ья]|октябр[ья]|ноябр[ья]|декабр[ья])'
+
+_WEEKDAYS = {
+    'понедельник': 0, 'вторник': 1, 'сред': 2, 'четверг': 3, 'пятниц': 4, 'суббот': 5, 'воскресенье': 6
+}
+_RELATIVE_DAYS = {'сегодня': 0, 'завтра': 1, 'послезавтра': 2}
+
+_PHONE_RE = re.compile(r'(?<!\d)(?:\+?7|8)?[\s\-(]*\d{3}[\s\-)]*\d{3}[\s\-]*\d{2}[\s\-]*\d{2}(?!\d)')
+_ISO_DATE_RE = re.compile(r'(?<!\d)(\d{4})-(\d{1,2})-(\d{1,2})(?!\d)')
+# Любое числовое обозначение даты: если оно есть, а дата не разобрана - значение не принимается
+_DATE_TOKEN_RE = re.compile(r'(?<!\d)\d{1,4}[-./]\d{1,2}(?:[-./]\d{1,4})?(?!\d)')
+_NUMERIC_DATE_RE = re.compile(r'(?<![\d:])(\d{1,2})[./](\d{1,2})(?:[./](\d{2}|\d{4}))?(?![\d:])')
+_TEXT_DATE_RE = re.compile(r'(?<!\d)(\d{1,2})\s+' + _MONTH_WORD_RE + r'(?![а-я])')
+# 14:00 - всегда время; 14.00 - время, если перед ним "в" или минуты не похожи на месяц
+_TIME_RE = re.compile(r'(?<![\d.:])(\d{1,2}):(\d{2})(?::\d{2})?(?![\d:])'
+                      r'|\bв\s*(\d{1,2})\.(\d{2})(?![\d.])'
+                      r'|(?<![\d.])(\d{1,2})\.(1[3-9]|[2-5]\d)(?![\d.])')
+# Время вида ЧЧ:ММ: если оно есть, а время не разобрано - значение не принимается
+_TIME_TOKEN_RE = re.compile(r'\d:\d')
+_HOUR_RE = re.compile(r'\bв\s*(\d{1,2})(?:\s*(?:час\w*|ч\.?))?(?:\s+(утра|дня|вечера|ночи))?(?![\d:.])')
+
+
+def _now():
+    return datetime.now(BOOKING_TIMEZONE)
+
+
+def parse_phone(text: str):
+    """Российский номер телефона в формате +7XXXXXXXXXX или None"""
+    match = _PHONE_RE.search(text or '')
+    if not match:
+        return None
+    digits = re.sub(r'\D', '', match.group(0))
+    if len(digits) == 11 and digits[0] in '78':
+        digits = digits[1:]
+    if len(digits) != 10 or digits[0] not in '3489':
+        return None
+    return f"+7{digits}"
+
+
+def _parse_date(text: str, now: datetime, booking_time: time = None):
+    today = now.date()
+    for word, offset in _RELATIVE_DAYS.items():
+        if re.search(rf'\b{word}\b', text):
+            return today + timedelta(days=offset)
+    # 2026-11-05 - формат аргументов save_booking_data от ассистента
+    match = _ISO_DATE_RE.search(text)
+    if match:
+        try:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        except ValueError:
+            return None
+    match = _TEXT_DATE_RE.search(text)
+    if match:
+        word = match.group(2)
+        month = next(number for prefix, number in _MONTHS.items() if word.startswith(prefix))
+        day = int(match.group(1))
+        return _nearest_date(today, day, month)
+    match = _NUMERIC_DATE_RE.search(text)
+    if match:
+        day, month, year = int(match.group(1)), int(match.group(2)), match.group(3)
+        if year:
+            year = int(year) + (2000 if len(year) == 2 else 0)
+            try:
+                return date(year, month, day)
+            except ValueError:
+                return None
+        return _nearest_date(today, day, month)
+    for stem_, weekday in _WEEKDAYS.items():
+        if re.search(rf'\b{stem_}', text):
+            days = (weekday - today.weekday()) % 7
+            # "В понедельник в 10" в понедельник после 10:00 - следующий понедельник
+            if days == 0 and booking_time is not None and booking_time <= now.time().replace(tzinfo=None):
+                days = 7
+            return today + timedelta(days=days)
+    return None
+
+
+def _nearest_date(today: date, day: int, month: int):
+    """Ближайшая будущая дата с таким днём и месяцем"""
+    try:
+        candidate = date(today.year, month, day)
+        if candidate < today:
+            candidate = date(today.year + 1, month, day)
+        return candidate
+    except ValueError:
+        return None
+
+
+def _parse_time(text: str):
+    match = _TIME_RE.search(text)
+    if match:
+        hour, minute = (int(group) for group in match.groups() if group is not None)
+    else:
+        match = _HOUR_RE.search(text)
+        if not match:
+            return None
+        hour, minute = int(match.group(1)), 0
+        part = match.group(2)
+        if part in ('дня', 'вечера') and hour < 12:
+            hour += 12
+        elif part == 'ночи' and hour == 12:
+            hour = 0
+    if hour > 23 or minute > 59:
+        return None
+    return time(hour, minute)
+
+
+def parse_datetime(text: str, now: datetime = None):
+    """
+    Дата и время записи из текста ("завтра в 14:00", "15 марта в 7 вечера",
+    "в пятницу 18.30", "20.05", "2026-11-05T14:00:00"). Возвращает
+    (datetime, has_time) в часовом поясе клуба или (None, False).
+    """
+    now = now or _now()
+    text = (text or '').lower().replace('ё', 'е')
+    # Время вида 14.00 не должно читаться как дата
+    booking_time = _parse_time(text)
+    text_without_time = _TIME_RE.sub(' ', text) if booking_time else text
+    # Время указано, но не разобрано ("в 25:00"): не записываем на дату без времени
+    if _TIME_TOKEN_RE.search(text_without_time):
+        return None, False
+    booking_date = _parse_date(text_without_time, now, booking_time)
+    if booking_date is None:
+        # Дата указана, но не разобрана: не подставляем вместо неё сегодняшнюю
+        if booking_time is None or _DATE_TOKEN_RE.search(text_without_time):
+            return None, False
+        # Только время: сегодня, а если уже прошло - завтра
+        booking_date = now.date()
+        if booking_time <= now.time().replace(tzinfo=None):
+            booking_date += timedelta(days=1)
+    value = BOOKING_TIMEZONE.localize(datetime.combine(booking_date, booking_time or time(0, 0)))
+    return value, booking_time is not None
+
+
+def format_booking_datetime(value: datetime, has_time: bool) -> str:
+    return value.strftime(DATETIME_FORMAT if has_time else DATE_FORMAT)
+
+
+def normalize_datetime(text: str, now: datetime = None):
+    """Дата записи строкой "ДД.ММ.ГГГГ ЧЧ:ММ" или None, если не распознана или в прошлом"""
+    now = now or _now()
+    value, has_time = parse_datetime(text, now)
+    if value is None:
+        return None
+    if (has_time and value < now) or (not has_time and value.date() < now.date()):
+        return None
+    return format_booking_datetime(value, has_time)
+
+
+def parse_master_category(text: str):
+    """Категория мастера из ответа на меню (номер или название)"""
+    text = (text or '').lower().strip()
+    match = re.fullmatch(r'([1-4])[.)]?', text)
+    if match:
+        return MASTER_CATEGORIES[int(match.group(1)) - 1]
+    if 'эксперт' in text:
+        return 'Эксперт'
+    if 'ведущ' in text:
+        return 'Ведущий тренер'
+    if 'персональн' in text:
+        return 'Персональный тренер'
+    if re.search(r'\bтренер', text):
+        return 'Тренер'
+    return None
+
+
+def extract_slots(text: str, now: datetime = None) -> dict:
+    """Поля записи, которые удалось однозначно извлечь из одного сообщения"""
+    slots = {}
+    phone = parse_phone(text)
+    if phone:
+        slots['phone'] = phone
+        text = _PHONE_RE.sub(' ', text)
+    booking_date = normalize_datetime(text, now)
+    if booking_date:
+        slots['date'] = booking_date
+    master = parse_master_category(text) if re.search(r'эксперт|ведущ|тренер', text.lower()) else None
+    if master:
+        slots['master'] = master
+    return slots
+
+
+def validate_booking(data: dict) -> dict:
+    """Ошибки в данных записи перед сохранением в таблицу: {поле: описание}, пусто - всё в порядке"""
+    errors = {}
+    if not (data.get('name') or '').strip():
+        errors['name'] = 'не указано имя'
+    if not parse_phone(data.get('phone', '')):
+        errors['phone'] = 'некорректный номер телефона'
+    if not normalize_datetime(data.get('date', '')):
+        errors['date'] = 'не удалось распознать дату и время записи (или они уже прошли)'
+    return errors
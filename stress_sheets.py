@@ -0,0 +1,223 @@
+"""
+Нагрузочная проверка сохранения заявок в Google Sheets.
+
+Поднимает локальный фейковый Sheets API (values.append), направляет на него
+клиент из sheets_pool.py и сохраняет заявки через
+functions.save_application_to_sheets из нескольких потоков одновременно.
+Проверяет, что каждая заявка дошла ровно один раз и без искажений, и
+выводит пропускную способность и максимум параллельных запросов. Потоки,
+не завершившиеся за --timeout, считаются зависшими (FAIL), а не блокируют
+проверку. Сама проверка пула входит в tests/test_sheets_pool.py.
+
+Запуск:
+> python stress_sheets.py [--threads 16] [--requests 400] [--delay-ms 20]
+> python stress_sheets.py --shared   # один общий клиент на все потоки (как раньше)
+> python stress_sheets.py --timeout 30
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+APPEND_PATH_RE = re.compile(r'^/v4/spreadsheets/([^/]+)/values/(.+):append$')
+SPREADSHEET_ID = 'stress-test'
+
+
+class FakeSheets:
+    """Принятые строки и счётчик одновременных запросов фейкового сервера"""
+
+    def __init__(self, delay_ms: float):
+        self.delay_ms = delay_ms
+        self.lock = threading.Lock()
+        self.rows = []
+        self.bad_requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, как у настоящего API
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, payload: dict):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                with fake.lock:
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                    raw = self.rfile.read(length)
+                    match = APPEND_PATH_RE.match(self.path.split('?')[0])
+                    try:
+                        values = json.loads(raw)['values']
+                        valid = match is not None and len(values) == 1 and len(values[0]) == 6
+                    except (ValueError, KeyError, TypeError):
+                        valid = False
+                    if not valid:
+                        with fake.lock:
+                            fake.bad_requests += 1
+                        self._reply(400, {'error': {'code': 400, 'message': 'bad request'}})
+                        return
+                    time.sleep(random.uniform(0, fake.delay_ms) / 1000)
+                    with fake.lock:
+                        fake.rows.append(values[0])
+                    self._reply(200, {
+                        'spreadsheetId': match.group(1),
+                        'updates': {'updatedRange': unquote(match.group(2)), 'updatedRows': 1}
+                    })
+                finally:
+                    with fake.lock:
+                        fake.in_flight -= 1
+
+        return Handler
+
+
+class SharedClient:
+    """Один клиент на все потоки - поведение до sheets_pool (для сравнения)"""
+
+    def __init__(self, pool):
+        self._service = pool.service()
+
+    def values(self):
+        return self._service.spreadsheets().values()
+
+
+def booking(index: int) -> dict:
+    return {
+        'name': f'stress-{index}',
+        'phone': f'+7999{index:07d}',
+        'service': 'Персональная тренировка',
+        'date': '20.10.2026 14:00',
+        'master': 'Эксперт',
+        'comment': 'x' * (index % 50)
+    }
+
+
+def _save_all(save, threads: int, requests: int, timeout: float):
+    """
+    Сохраняет заявки из threads потоков. Каждый поток ждём не дольше общего
+    timeout: зависший поток (общий клиент httplib2 может заблокироваться)
+    не останавливает проверку. Результат заявки - True/False, None - не завершена.
+    """
+    results = [None] * requests
+
+    def work(first: int):
+        for index in range(first, requests, threads):
+            try:
+                results[index] = save(booking(index))
+            except Exception:
+                results[index] = False
+
+    workers = [threading.Thread(target=work, args=(first,), name=f"stress-{first}", daemon=True)
+               for first in range(threads)]
+    for worker in workers:
+        worker.start()
+    deadline = time.monotonic() + timeout
+    for worker in workers:
+        worker.join(max(0.0, deadline - time.monotonic()))
+    hung = sum(1 for worker in workers if worker.is_alive())
+    return results, hung
+
+
+def run(threads: int, requests: int, delay_ms: float, shared: bool = False, timeout: float = 60) -> dict:
+    """Прогон через фейковый сервер; GOOGLE_SHEET_ID должен быть задан"""
+    fake = FakeSheets(delay_ms)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), fake.handler())
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    import functions
+    from google.auth.credentials import AnonymousCredentials
+    from sheets_pool import SheetsClientPool
+    pool = SheetsClientPool(AnonymousCredentials(), api_endpoint=endpoint)
+    previous_pool = functions.sheets_pool
+    functions.sheets_pool = SharedClient(pool) if shared else pool
+    try:
+        start = time.perf_counter()
+        results, hung = _save_all(functions.save_application_to_sheets, threads, requests, timeout)
+        elapsed = time.perf_counter() - start
+    finally:
+        functions.sheets_pool = previous_pool
+        server.shutdown()
+
+    expected = {booking(i)['name']: booking(i) for i in range(requests)}
+    with fake.lock:
+        rows = list(fake.rows)
+    received = {}
+    corrupted = 0
+    for row in rows:
+        data = expected.get(row[0])
+        if data is None or row[1:] != ["'" + data['phone'], data['service'], data['date'],
+                                        data['master'], data['comment']]:
+            corrupted += 1
+            continue
+        received[row[0]] = received.get(row[0], 0) + 1
+    stats = {
+        'elapsed': elapsed,
+        'succeeded': results.count(True),
+        'failed': results.count(False),
+        'unfinished': results.count(None),
+        'hung_threads': hung,
+        'accepted': len(rows),
+        'corrupted': corrupted,
+        'bad_requests': fake.bad_requests,
+        'missing': len(expected) - len(received),
+        'duplicates': sum(count - 1 for count in received.values()),
+        'max_in_flight': fake.max_in_flight,
+        'clients_built': pool.clients_built
+    }
+    stats['ok'] = (stats['succeeded'] == requests and not hung and not corrupted and not fake.bad_requests
+                   and not stats['missing'] and not stats['duplicates'])
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочная проверка записи заявок в фейковый Sheets API")
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--delay-ms', type=float, default=20, help='задержка ответа сервера (случайная, до)')
+    parser.add_argument('--shared', action='store_true', help='один общий клиент на все потоки')
+    parser.add_argument('--timeout', type=float, default=60, help='сек на весь прогон, дальше поток считается зависшим')
+    args = parser.parse_args()
+
+    os.environ['GOOGLE_SHEET_ID'] = SPREADSHEET_ID
+    stats = run(args.threads, args.requests, args.delay_ms, args.shared, args.timeout)
+    elapsed = stats['elapsed']
+
+    print(f"Режим: {'общий клиент' if args.shared else 'клиент на поток'}, "
+          f"потоков: {args.threads}, заявок: {args.requests}")
+    print(f"Время: {elapsed:.2f} сек ({stats['succeeded'] / elapsed:.0f} заявок/сек)")
+    print(f"Успешно: {stats['succeeded']}, ошибок: {stats['failed']}, не завершено: {stats['unfinished']}")
+    print(f"Сервер: принято {stats['accepted']}, искажено {stats['corrupted']}, отклонено {stats['bad_requests']}, "
+          f"потеряно {stats['missing']}, дублей {stats['duplicates']}")
+    print(f"Параллельных запросов (макс.): {stats['max_in_flight']}, клиентов создано: {stats['clients_built']}")
+    if stats['hung_threads']:
+        print(f"❌ FAIL: зависло потоков {stats['hung_threads']} (не завершились за {args.timeout:.0f} сек)")
+    elif stats['corrupted'] or stats['bad_requests']:
+        print("❌ FAIL: запросы искажены")
+    else:
+        print("✅ OK" if stats['ok'] else "❌ FAIL")
+    # Зависшие daemon-потоки не мешают выходу
+    return 0 if stats['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,32 @@
+import pytest
+
+import functions
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    functions._answer_cache.clear()
+    yield
+    functions._answer_cache.clear()
+
+
+def test_unknown_question_gets_booking_offer():
+    assert functions.assistant_fallback_reply('Есть ли сауна?') == functions.BREAKER_FALLBACK_REPLY
+
+
+@pytest.mark.parametrize('message', ['да', '2', 'спасибо', 'А как?', 'Можно в пятницу в 18:00?'])
+def test_contextual_replies_are_not_cached(message):
+    functions.remember_answer(message, 'Ваша запись подтверждена')
+    assert functions.assistant_fallback_reply(message) == functions.BREAKER_FALLBACK_REPLY
+
+
+def test_standalone_question_is_replayed():
+    functions.remember_answer('Во сколько вы открываетесь?', 'С 7:00 до 23:00')
+    assert functions.assistant_fallback_reply('во сколько  вы открываетесь?') == 'С 7:00 до 23:00'
+
+
+def test_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(functions, 'ANSWER_CACHE_SIZE', 2)
+    for i in range(3):
+        functions.remember_answer(f'Сколько стоит абонемент номер {i}?', str(i))
+    assert len(functions._answer_cache) == 2
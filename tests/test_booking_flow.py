@@ -0,0 +1,60 @@
+import pytest
+
+import main
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    sent, saved = [], []
+    monkeypatch.setattr(main, 'send_message', lambda chat_id, text, keyboard=None: sent.append(text))
+    monkeypatch.setattr(main, 'save_booking_data', lambda *args: saved.append(args) or 'Заявка сохранена')
+    chat_id = 1001
+    yield chat_id, sent, saved
+    main.user_states.pop(chat_id, None)
+
+
+def answer(chat_id: int, text: str):
+    main.handle_booking_step(chat_id, main.user_states[chat_id], text)
+
+
+def test_full_form_is_saved(chat):
+    chat_id, sent, saved = chat
+    main.start_booking(chat_id)
+    for text in ['Анна', '8 999 123 45 67', 'Персональная тренировка', 'завтра в 14:00', '2', '']:
+        answer(chat_id, text)
+    assert len(saved) == 1
+    name, phone, service, date, master, comment = saved[0]
+    assert (name, phone, master, comment) == ('Анна', '+79991234567', 'Персональный тренер', '')
+    assert date.endswith('14:00')
+    assert chat_id not in main.user_states
+
+
+def test_unparsed_phone_is_asked_again(chat):
+    chat_id, sent, saved = chat
+    main.start_booking(chat_id, prefill={'name': 'Анна'})
+    answer(chat_id, 'не скажу')
+    assert sent[-1] == main.BOOKING_RETRY_PROMPTS['phone']
+    assert main.user_states[chat_id]['step'] == 'phone'
+
+
+def test_booking_saved_after_validation_reask(chat):
+    chat_id, sent, saved = chat
+    main.start_booking(chat_id)
+    for text in [' ', '+7 999 123 45 67', 'Персональная тренировка', 'завтра в 14:00', '2', 'нет']:
+        answer(chat_id, text)
+    assert not saved
+    assert 'не указано имя' in sent[-1]
+    assert main.user_states[chat_id]['step'] == 'name'
+
+    answer(chat_id, 'Анна')
+    assert len(saved) == 1
+    assert saved[0][0] == 'Анна'
+    assert sent[-1] == 'Заявка сохранена'
+    assert chat_id not in main.user_states
+
+
+def test_slots_from_one_answer_skip_steps(chat):
+    chat_id, sent, saved = chat
+    main.start_booking(chat_id, prefill={'name': 'Анна', 'phone': '+79991234567'})
+    answer(chat_id, 'Массаж завтра в 18:00')
+    assert main.user_states[chat_id]['step'] == 'master'
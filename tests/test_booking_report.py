@@ -0,0 +1,74 @@
+import csv
+import os
+import subprocess
+import sys
+
+import pytest
+
+from booking_report import COLUMNS, NO_DATE, iter_csv_pages, period_key, pipelined, summarize, write_csv
+
+ROWS = [
+    ['Анна', "'+79991234567", 'Массаж', '20.10.2026 14:00', 'Эксперт', ''],
+    ['Иван', '+79990000000', 'Массаж', '2026-10-21 10:00:00', 'Эксперт', 'после работы'],
+    ['Олег', '+79991111111', 'Бассейн', 'когда-нибудь', '', ''],
+]
+
+
+@pytest.fixture
+def export(tmp_path):
+    path = tmp_path / 'export.csv'
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(ROWS)
+    return str(path)
+
+
+def test_pages_skip_header_and_strip_phone_apostrophe(export):
+    pages = list(iter_csv_pages(export, page_size=2))
+    assert [len(page) for page in pages] == [2, 1]
+    assert pages[0][0][1] == '+79991234567'
+
+
+def test_pipelined_report_matches_input(export, tmp_path):
+    output = str(tmp_path / 'report.csv')
+    assert write_csv(pipelined(iter_csv_pages(export, page_size=1)), output) == 3
+    with open(output, 'r', encoding='utf-8-sig', newline='') as f:
+        assert list(csv.reader(f))[0] == COLUMNS
+
+
+def test_pipelined_reraises_reader_errors():
+    def pages():
+        yield [['row']]
+        raise RuntimeError('Sheets API error')
+
+    with pytest.raises(RuntimeError):
+        list(pipelined(pages()))
+
+
+def test_summary_by_week(export):
+    summary = summarize(pipelined(iter_csv_pages(export)), 'week')
+    assert summary[('неделя с 2026-10-19', 'Массаж', 'Эксперт')] == 2
+    assert summary[(NO_DATE, 'Бассейн', 'не указана')] == 1
+
+
+def test_period_key_by_day():
+    assert period_key('20.10.2026', 'day') == '2026-10-20'
+
+
+def test_report_does_not_import_the_bot(tmp_path):
+    code = (
+        "import sys, booking_report\n"
+        "try:\n"
+        "    next(booking_report.iter_sheet_pages('sheet'))\n"
+        "except FileNotFoundError:\n"
+        "    pass\n"
+        "print('functions' in sys.modules, 'scheduler' in sys.modules)"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, 'GOOGLE_SHEETS_CREDENTIALS_FILE': str(tmp_path / 'missing.json'),
+           'PYTHONPATH': os.pathsep.join([root, os.environ.get('PYTHONPATH', '')])}
+    result = subprocess.run([sys.executable, '-c', code], cwd=str(tmp_path), env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == 'False False'
@@ -0,0 +1,50 @@
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def make_breaker(**kwargs):
+    options = dict(window_size=10, min_calls=4, failure_rate_threshold=0.5, slow_call_seconds=1.0,
+                   slow_call_rate_threshold=0.5, open_seconds=60)
+    options.update(kwargs)
+    return CircuitBreaker('test', **options)
+
+
+def test_opens_on_failure_rate():
+    breaker = make_breaker()
+    for _ in range(2):
+        breaker.record_success(0.1)
+    for _ in range(2):
+        breaker.record_failure(0.1)
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.snapshot()['rejected_calls'] == 1
+
+
+def test_opens_on_slow_calls():
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record_success(5.0)
+    assert breaker.state == OPEN
+
+
+def test_stays_closed_below_min_calls():
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_closes_or_reopens():
+    breaker = make_breaker(open_seconds=0)
+    for _ in range(4):
+        breaker.record_failure()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+
+    for _ in range(4):
+        breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.snapshot()['times_opened'] == 3
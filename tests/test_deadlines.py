@@ -0,0 +1,55 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import functions
+
+
+class FakeRuns:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.cancelled = []
+
+    def cancel(self, thread_id, run_id, timeout):
+        if self.fail:
+            raise RuntimeError('network down')
+        self.cancelled.append((thread_id, run_id, timeout))
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    runs = FakeRuns()
+    client = SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(runs=runs)))
+    monkeypatch.setattr(functions, 'openai_client', client)
+    monkeypatch.setattr(functions, 'deadline_stats', {'misses': 0, 'cancelled_runs': 0, 'cancel_failures': 0})
+    return runs
+
+
+def test_deadline_timeout_never_exceeds_remaining():
+    deadline = functions.Deadline(0.2)
+    assert 0 < deadline.timeout() <= 0.2
+    time.sleep(0.25)
+    assert deadline.expired()
+    assert deadline.timeout() == 0.1
+
+
+def test_missed_deadline_cancels_run(runs):
+    with pytest.raises(functions.AssistantRunError) as error:
+        functions._deadline_missed('thread_1', 'run_1')
+    assert error.value.user_message == functions.DEADLINE_REPLY
+    assert runs.cancelled == [('thread_1', 'run_1', functions.RUN_CANCEL_TIMEOUT)]
+    assert functions.deadline_stats['misses'] == 1
+    assert functions.deadline_stats['cancelled_runs'] == 1
+
+
+def test_missed_deadline_before_run_has_nothing_to_cancel(runs):
+    with pytest.raises(functions.AssistantRunError):
+        functions._deadline_missed('thread_1')
+    assert runs.cancelled == []
+
+
+def test_cancel_failure_is_counted(runs):
+    runs.fail = True
+    functions.cancel_run('thread_1', 'run_1')
+    assert functions.deadline_stats['cancel_failures'] == 1
@@ -0,0 +1,34 @@
+import pytest
+
+from intent_router import BOOKING, GREETING, QUESTION, classify_intent
+
+
+@pytest.mark.parametrize('text', [
+    'Хочу записаться на массаж',
+    'Запишите меня на завтра',
+    'Хочу забронировать тренировку',
+    'хочу бронь на субботу',
+    'записаться на завтра в 14:00',
+])
+def test_booking_requests(text):
+    assert classify_intent(text) == BOOKING
+
+
+@pytest.mark.parametrize('text', [
+    'у меня бронь на завтра, можно перенести?',
+    'Бронь сохраняется, если я опоздаю?',
+    'хочу отменить запись на завтра',
+    'у меня запись на завтра, можно перенести?',
+    'перенесите запись на пятницу',
+    'записалась на завтра, во сколько приходить?',
+    'не хочу записываться на завтра',
+    'не хочу записаться на завтра',
+    'Как записаться?',
+    'Сколько стоит абонемент?',
+])
+def test_questions_are_not_bookings(text):
+    assert classify_intent(text) == QUESTION
+
+
+def test_greeting():
+    assert classify_intent('Добрый день!') == GREETING
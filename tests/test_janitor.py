@@ -0,0 +1,77 @@
+import pytest
+
+import janitor
+from janitor import ThreadJanitor
+
+
+@pytest.fixture(autouse=True)
+def fast_deletes(monkeypatch):
+    monkeypatch.setattr(janitor, 'JANITOR_DELETE_PER_SECOND', 1000)
+
+
+class Deleter:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.deleted = []
+
+    def __call__(self, thread_id):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError('OpenAI 500')
+        self.deleted.append(thread_id)
+
+
+def test_idle_threads_are_unmapped_and_deleted():
+    deleter = Deleter()
+    threads = {'u1': 't1', 'u2': 't2'}
+    counts = {'u1': 3, 'u2': 5}
+    cleaner = ThreadJanitor(deleter, lambda: {'t2'}, thread_ttl=0)
+    cleaner.add_thread_map('web', threads, counts)
+    cleaner.touch('t1')
+    cleaner.touch('t2')
+    cleaner.sweep()
+    assert threads == {'u2': 't2'}
+    assert counts == {'u2': 5}
+    assert deleter.deleted == ['t1']
+
+
+def test_threads_from_previous_process_get_a_fresh_ttl():
+    deleter = Deleter()
+    threads = {'u1': 't1'}
+    cleaner = ThreadJanitor(deleter, set, thread_ttl=3600)
+    cleaner.add_thread_map('telegram', threads)
+    cleaner.sweep()
+    assert threads == {'u1': 't1'}
+    assert deleter.deleted == []
+
+
+def test_failed_delete_is_retried_on_next_sweep():
+    deleter = Deleter(failures=1)
+    cleaner = ThreadJanitor(deleter, set, thread_ttl=0)
+    cleaner.add_thread_map('telegram', {'u1': 't1'})
+    cleaner.touch('t1')
+    cleaner.sweep()
+    assert deleter.deleted == []
+    cleaner.sweep()
+    assert deleter.deleted == ['t1']
+    assert cleaner.snapshot()['delete_errors'] == 1
+
+
+def test_abandoned_thread_waits_for_grace_period(monkeypatch):
+    deleter = Deleter()
+    cleaner = ThreadJanitor(deleter, set)
+    cleaner.abandon('t_old')
+    cleaner.sweep()
+    assert deleter.deleted == []
+    monkeypatch.setattr(janitor, 'ABANDONED_GRACE_SECONDS', 0)
+    cleaner.sweep()
+    assert deleter.deleted == ['t_old']
+
+
+def test_stale_states_expire():
+    states = {1: {'mode': 'booking', 'updated_at': 0}, 2: {'mode': 'consult'}}
+    cleaner = ThreadJanitor(Deleter(), set)
+    cleaner.add_state_store('user_states', states, ttl=3600)
+    cleaner.sweep()
+    assert list(states) == [2]
+    assert 'updated_at' in states[2]
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+import functions
+from knowledge_index import KnowledgeIndex, build_index, tokenize
+
+FAQ = [
+    {'question': 'Какие часы работы клуба?', 'answer': 'Клуб открыт с 7:00 до 23:00 ежедневно.'},
+    {'question': 'Есть ли парковка?', 'answer': 'Бесплатная парковка для членов клуба.'},
+    {'question': 'Можно ли заморозить абонемент?', 'answer': 'Заморозка до 30 дней в год.'},
+]
+PRICES = 'Массаж спины - 2500 руб.\n\nПерсональная тренировка - 3000 руб.\n\nБассейн - 1500 руб.'
+
+
+@pytest.fixture
+def index(tmp_path):
+    (tmp_path / 'faq.json').write_text(json.dumps(FAQ, ensure_ascii=False), encoding='utf-8')
+    (tmp_path / 'prices.txt').write_text(PRICES, encoding='utf-8')
+    path = tmp_path / 'index.json'
+    path.write_text(json.dumps(build_index([str(tmp_path)]), ensure_ascii=False), encoding='utf-8')
+    return KnowledgeIndex.load(str(path))
+
+
+def test_stopwords_and_endings_are_dropped():
+    assert tokenize('А где у вас часы работы?') == tokenize('часы работы')
+
+
+def test_faq_question_is_answered_directly(index):
+    assert index.direct_answer('Какие у вас часы работы клуба?') == FAQ[0]['answer']
+
+
+def test_vague_question_is_not_answered_directly(index):
+    assert index.direct_answer('Сколько стоит массаж спины?') is None
+
+
+def test_passages_for_price_question(index):
+    passages = index.passages('Сколько стоит массаж спины?', k=2, min_score=0.5)
+    assert passages[0] == 'Массаж спины - 2500 руб.'
+
+
+def test_unsupported_index_version():
+    with pytest.raises(ValueError):
+        KnowledgeIndex({'version': 0})
+
+
+def test_prepare_request_passes_passages_per_run(index, monkeypatch):
+    monkeypatch.setattr(functions, 'knowledge_index', index)
+    monkeypatch.setattr(functions, 'KNOWLEDGE_MIN_SCORE', 0.5)
+    direct_answer, run_options = functions.prepare_assistant_request('Сколько стоит массаж спины?')
+    assert direct_answer is None
+    assert 'Массаж спины - 2500 руб.' in run_options['additional_instructions']
+    assert 'tools' in run_options
+
+
+def test_prepare_request_direct_answer(index, monkeypatch):
+    monkeypatch.setattr(functions, 'knowledge_index', index)
+    assert functions.prepare_assistant_request('Какие у вас часы работы клуба?') == (FAQ[0]['answer'], {})
@@ -0,0 +1,24 @@
+import pytest
+
+import main
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, 'DEBUG_TOKEN', 'secret')
+    return main.app.test_client()
+
+
+def test_public_metrics_have_no_user_ids_or_urls(client):
+    metrics = client.get('/metrics').get_json()
+    assert 'channels' in metrics['openai_usage']
+    assert 'top_users' not in metrics['openai_usage']
+    assert 'tunnel_url' not in metrics['telegram_webhook']
+    assert 'webhook_url' not in metrics['telegram_webhook']
+
+
+def test_debug_metrics_require_token(client):
+    assert client.get('/debug/metrics').status_code == 403
+    response = client.get('/debug/metrics', headers={'X-Debug-Token': 'secret'})
+    assert 'top_users' in response.get_json()['openai_usage']
+    assert 'webhook_url' in response.get_json()['telegram_webhook']
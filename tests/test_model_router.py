@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import pytest
+
+from model_router import DEFAULT_CONFIG, FAST, FULL, ModelRouter
+
+
+@pytest.fixture
+def router():
+    return ModelRouter(DEFAULT_CONFIG, enabled=True)
+
+
+@pytest.mark.parametrize('text', ['Во сколько открываетесь?', 'Где вы находитесь?', 'привет'])
+def test_short_question_is_fast(router, text):
+    assert router.classify(text) == FAST
+
+
+@pytest.mark.parametrize('text', [
+    'Хочу записаться на завтра',
+    'Сколько стоит абонемент? А есть ли бассейн?',
+    '+7 999 123 45 67',
+    'завтра в 14:00',
+])
+def test_booking_and_compound_messages_are_full(router, text):
+    assert router.classify(text) == FULL
+
+
+def test_routing_can_be_disabled():
+    assert ModelRouter(DEFAULT_CONFIG, enabled=False).classify('Где вы находитесь?') == FULL
+
+
+def test_fast_tier_overrides_model(router):
+    assert router.run_options(FAST) == {'model': 'gpt-4o-mini'}
+    assert router.run_options(FULL) == {}
+
+
+def test_latency_and_cost_per_tier(router):
+    router.record_run(FAST, 0.8, ok=True)
+    router.record_run(FAST, 1.2, ok=False)
+    router.record_usage(FAST, 'gpt-4o-mini', SimpleNamespace(prompt_tokens=1_000_000, completion_tokens=0))
+    router.record_usage(FULL, 'gpt-4o', SimpleNamespace(prompt_tokens=0, completion_tokens=1_000_000))
+    tiers = router.snapshot()['tiers']
+    assert tiers[FAST]['runs'] == 2 and tiers[FAST]['errors'] == 1
+    assert tiers[FAST]['latency_p95_sec'] == 1.2
+    assert tiers[FAST]['cost_usd'] == 0.15
+    assert tiers[FULL]['cost_usd'] == 10.0
+
+
+def test_booking_dialog_stays_on_full(router):
+    conversation = ('web', 'visitor-1')
+    assert router.classify('Хочу записаться на массаж', conversation) == FULL
+    for text in ['Анна', 'да', 'спасибо']:
+        assert router.classify(text, conversation) == FULL
+    assert router.classify('Анна', ('web', 'visitor-2')) == FAST
+
+
+def test_sticky_full_expires(router):
+    router.sticky_seconds = 0
+    conversation = ('telegram', 1)
+    router.classify('Хочу записаться', conversation)
+    assert router.classify('Где вы находитесь?', conversation) == FAST
@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import pytest
+
+import functions
+from run_checkpoints import RunCheckpoints
+
+
+@pytest.fixture
+def checkpoints(tmp_path, monkeypatch):
+    checkpoints = RunCheckpoints(str(tmp_path / 'run_checkpoints.json'))
+    monkeypatch.setattr(functions, 'run_checkpoints', checkpoints)
+    return checkpoints
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = SimpleNamespace(
+        models=SimpleNamespace(list=lambda timeout: []),
+        beta=SimpleNamespace(
+            assistants=SimpleNamespace(retrieve=lambda assistant_id, timeout: SimpleNamespace(id='asst_1')),
+            threads=SimpleNamespace(runs=SimpleNamespace(create=lambda **kwargs: SimpleNamespace(id='run_1')))
+        )
+    )
+    monkeypatch.setattr(functions, 'openai_client', client)
+    monkeypatch.setattr(functions, '_post_telegram_message', lambda user_id, message, deadline: 'thread_1')
+    return client
+
+
+def test_deferred_run_is_resumed_on_next_start(checkpoints):
+    checkpoints.add('run_1', 'telegram', 42, 'thread_1')
+    checkpoints.defer('run_1')
+    assert checkpoints.active_count() == 0
+    assert checkpoints.wait_idle(0)
+    assert [c['run_id'] for c in RunCheckpoints(checkpoints.path).pending()] == ['run_1']
+
+
+def test_checkpoint_is_kept_until_reply_is_delivered(checkpoints, client, monkeypatch):
+    monkeypatch.setattr(functions, '_poll_telegram_run', lambda user_id, thread_id, run, deadline: 'Ответ')
+
+    assert functions._get_openai_assistant_reply(42, 'Вопрос', functions.Deadline(), {}) == 'Ответ'
+    assert checkpoints.active_count() == 1
+    run_ids = functions.take_undelivered_runs()
+    assert run_ids == ['run_1']
+    functions.confirm_delivery(run_ids, delivered=True)
+    assert checkpoints.active_count() == 0
+    assert not checkpoints.pending()
+
+
+def test_failed_run_is_released_immediately(checkpoints, client, monkeypatch):
+    def fail(user_id, thread_id, run, deadline):
+        raise functions.AssistantRunError('Ошибка')
+
+    monkeypatch.setattr(functions, '_poll_telegram_run', fail)
+    with pytest.raises(functions.AssistantRunError):
+        functions._get_openai_assistant_reply(42, 'Вопрос', functions.Deadline(), {})
+    assert checkpoints.active_count() == 0
+    assert functions.take_undelivered_runs() == []
+
+
+def test_resumed_reply_is_kept_until_delivered(checkpoints, monkeypatch):
+    checkpoints.add('run_1', 'telegram', 42, 'thread_1')
+    checkpoints.defer('run_1')
+    monkeypatch.setattr(functions, 'openai_client', object())
+    monkeypatch.setattr(functions, '_resume_run', lambda checkpoint: 'Ответ')
+
+    functions.resume_pending_runs(lambda checkpoint, reply: False)
+    assert [c['run_id'] for c in checkpoints.pending()] == ['run_1']
+    functions.resume_pending_runs(lambda checkpoint, reply: True)
+    assert not checkpoints.pending()
+
+
+def test_queued_messages_survive_restart(checkpoints):
+    checkpoints.save_messages([(42, 'Первое'), (42, 'Второе')])
+    restarted = RunCheckpoints(checkpoints.path)
+    assert restarted.load_messages() == [(42, 'Первое'), (42, 'Второе')]
+    assert RunCheckpoints(checkpoints.path).load_messages() == []
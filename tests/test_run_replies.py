@@ -0,0 +1,22 @@
+from types import SimpleNamespace
+
+import functions
+
+
+def message(role: str, text: str):
+    return SimpleNamespace(role=role, content=[SimpleNamespace(type='text', text=SimpleNamespace(value=text))])
+
+
+def test_reply_is_read_from_the_run_messages_only(monkeypatch):
+    calls = []
+
+    def list_messages(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(data=[message('user', 'Вопрос'), message('assistant', 'Ответ')])
+
+    client = SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(messages=SimpleNamespace(list=list_messages))))
+    monkeypatch.setattr(functions, 'openai_client', client)
+    assert functions.fetch_run_reply('thread_1', 'run_1', functions.Deadline()) == 'Ответ'
+    assert calls[0]['run_id'] == 'run_1'
+    assert calls[0]['limit'] == functions.RUN_REPLY_PAGE
+    assert calls[0]['order'] == 'desc'
@@ -0,0 +1,70 @@
+import threading
+
+from scheduler import Scheduler
+
+
+def test_lane_is_resolved_after_previous_task_of_same_key():
+    scheduler = Scheduler({'booking': 1, 'consult': 1})
+    state = {'mode': 'booking'}
+    release = threading.Event()
+
+    def switch_mode():
+        release.wait(5)
+        state['mode'] = 'consult'
+
+    def lane():
+        return 'consult' if state['mode'] == 'consult' else 'booking'
+
+    scheduler.submit(lane, switch_mode, key=1)
+    question = scheduler.submit(lane, lambda: threading.current_thread().name, key=1)
+    release.set()
+    assert question.result(5).startswith('lane-consult')
+
+
+def test_same_key_runs_in_order_across_lanes():
+    scheduler = Scheduler({'booking': 2, 'consult': 2})
+    order = []
+    futures = [
+        scheduler.submit('consult' if i % 2 else 'booking', order.append, i, key=7)
+        for i in range(20)
+    ]
+    for future in futures:
+        future.result(5)
+    assert order == list(range(20))
+    assert scheduler.wait_idle(5)
+
+
+def test_busy_lane_does_not_block_other_lanes():
+    scheduler = Scheduler({'booking': 1, 'consult': 1})
+    release = threading.Event()
+    slow = scheduler.submit('consult', release.wait, 5, key=1)
+    fast = scheduler.submit('booking', lambda: 'step', key=2)
+    assert fast.result(1) == 'step'
+    assert not slow.done()
+    release.set()
+    assert slow.result(5)
+    assert scheduler.wait_idle(5)
+    assert scheduler.snapshot()['lanes']['booking']['completed'] == 1
+
+
+def test_failed_task_releases_key():
+    scheduler = Scheduler({'booking': 1})
+    failed = scheduler.submit('booking', lambda: 1 / 0, key=3)
+    after = scheduler.submit('booking', lambda: 'next', key=3)
+    assert after.result(5) == 'next'
+    assert isinstance(failed.exception(5), ZeroDivisionError)
+
+
+def test_cancel_queued_returns_tasks_not_started():
+    scheduler = Scheduler({'consult': 1})
+    started, release = threading.Event(), threading.Event()
+    ran = []
+    running = scheduler.submit('consult', lambda: started.set() or release.wait(5), key=1)
+    assert started.wait(5)
+    scheduler.submit('consult', ran.append, 'other chat', key=2)
+    scheduler.submit('consult', ran.append, 'same chat', key=1)
+    assert scheduler.cancel_queued() == [(ran.append, ('other chat',)), (ran.append, ('same chat',))]
+    release.set()
+    assert running.result(5)
+    assert scheduler.wait_idle(5)
+    assert ran == []
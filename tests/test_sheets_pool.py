@@ -0,0 +1,27 @@
+import threading
+
+import stress_sheets
+
+
+def test_each_thread_gets_its_own_client(monkeypatch):
+    monkeypatch.setenv('GOOGLE_SHEET_ID', stress_sheets.SPREADSHEET_ID)
+    stats = stress_sheets.run(threads=8, requests=80, delay_ms=2, timeout=30)
+    assert stats['ok'], stats
+    assert stats['succeeded'] == 80
+    assert stats['clients_built'] == 8
+    assert stats['max_in_flight'] > 1
+
+
+def test_hung_worker_is_reported_not_awaited():
+    release = threading.Event()
+
+    def save(data):
+        if data['name'] == 'stress-0':
+            release.wait(10)
+        return True
+
+    results, hung = stress_sheets._save_all(save, threads=2, requests=4, timeout=0.3)
+    release.set()
+    assert hung == 1
+    assert results[1] and results[3]
+    assert results[0] is None
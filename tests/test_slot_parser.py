@@ -0,0 +1,85 @@
+from datetime import datetime
+
+import pytest
+
+from slot_parser import (BOOKING_TIMEZONE, extract_slots, normalize_datetime, parse_datetime,
+                         parse_master_category, parse_phone, validate_booking)
+
+NOW = BOOKING_TIMEZONE.localize(datetime(2026, 10, 19, 10, 0))
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('+7 999 123-45-67', '+79991234567'),
+    ('89991234567', '+79991234567'),
+    ('мой номер (999) 123 45 67', '+79991234567'),
+    ('12345', None),
+])
+def test_parse_phone(text, expected):
+    assert parse_phone(text) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('в 3 ч дня', '19.10.2026 15:00'),
+    ('15 ноября в 7 вечера', '15.11.2026 19:00'),
+    ('завтра в 14:00', '20.10.2026 14:00'),
+    ('в пятницу 18.30', '23.10.2026 18:30'),
+    ('25.12', '25.12.2026'),
+])
+def test_normalize_datetime(text, expected):
+    assert normalize_datetime(text, NOW) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('в 2 часа дня', '19.10.2026 14:00'),
+    ('в 7 часов вечера', '19.10.2026 19:00'),
+    ('завтра в 9 часов утра', '20.10.2026 09:00'),
+])
+def test_hour_with_part_of_day(text, expected):
+    assert normalize_datetime(text, NOW) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('2026-11-05 14:00', '05.11.2026 14:00'),
+    ('2026-11-05T14:00', '05.11.2026 14:00'),
+    ('2026-10-20 14:00:00', '20.10.2026 14:00'),
+    ('2026-10-20T14:00:00', '20.10.2026 14:00'),
+    ('2026-11-05', '05.11.2026'),
+])
+def test_iso_dates(text, expected):
+    assert normalize_datetime(text, NOW) == expected
+
+
+@pytest.mark.parametrize('text', ['2026-13-45 14:00', '31.02.2027 14:00', '2026-10-01 14:00',
+                                  'завтра в 25:00', '2026-10-20 14:00:00:00'])
+def test_unparsed_or_past_date_is_rejected(text):
+    assert normalize_datetime(text, NOW) is None
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('в понедельник в 9', '26.10.2026 09:00'),
+    ('в понедельник в 12:00', '19.10.2026 12:00'),
+    ('в понедельник', '19.10.2026'),
+])
+def test_today_weekday_rolls_forward_when_time_passed(text, expected):
+    # NOW - понедельник, 10:00
+    assert normalize_datetime(text, NOW) == expected
+
+
+def test_time_only_is_today_or_tomorrow():
+    value, has_time = parse_datetime('в 9:30', NOW)
+    assert has_time and value.date().isoformat() == '2026-10-20'
+
+
+@pytest.mark.parametrize('text, expected', [('2', 'Персональный тренер'), ('эксперт', 'Эксперт'), ('любой', None)])
+def test_parse_master_category(text, expected):
+    assert parse_master_category(text) == expected
+
+
+def test_extract_slots_from_one_message():
+    slots = extract_slots('Массаж завтра в 18:00, телефон 8 999 123 45 67, к эксперту', NOW)
+    assert slots == {'phone': '+79991234567', 'date': '20.10.2026 18:00', 'master': 'Эксперт'}
+
+
+def test_validate_booking_reports_each_field():
+    errors = validate_booking({'name': ' ', 'phone': '123', 'date': 'вчера'})
+    assert set(errors) == {'name', 'phone', 'date'}
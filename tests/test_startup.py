@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['openai', 'googleapiclient', 'google.oauth2']
+
+
+def test_functions_import_does_not_load_heavy_clients():
+    code = (
+        "import sys, functions; "
+        f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ''
+
+
+def test_bundled_discovery_document_builds_values_methods():
+    from google.auth.credentials import AnonymousCredentials
+    from googleapiclient.discovery import build_from_document
+    with open(os.path.join(ROOT, 'sheets_discovery.json'), 'r', encoding='utf-8') as f:
+        service = build_from_document(f.read(), credentials=AnonymousCredentials())
+    values = service.spreadsheets().values()
+    request = values.append(spreadsheetId='sheet', range='Лист1!A:F', valueInputOption='RAW',
+                            body={'values': [['a']]})
+    assert request.method == 'POST'
+    assert request.uri.startswith('https://sheets.googleapis.com/v4/spreadsheets/sheet/values/')
+    assert values.get(spreadsheetId='sheet', range='Лист1!A1:F10').method == 'GET'
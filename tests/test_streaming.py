@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+import pytest
+
+import functions
+import main
+from run_checkpoints import RunCheckpoints
+
+
+class FakeStream:
+    def __init__(self, events):
+        self.events = events
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        return iter(self.events)
+
+
+def event(name: str, **data):
+    return SimpleNamespace(event=name, data=SimpleNamespace(**data))
+
+
+def test_run_without_tool_outputs_is_cancelled(tmp_path, monkeypatch):
+    tool_call = SimpleNamespace(id='call_1', function=SimpleNamespace(name='unknown_function', arguments='{}'))
+    required_action = SimpleNamespace(submit_tool_outputs=SimpleNamespace(tool_calls=[tool_call]))
+    stream = FakeStream([
+        event('thread.run.created', id='run_1'),
+        event('thread.run.requires_action', required_action=required_action)
+    ])
+    cancelled = []
+
+    def submit_tool_outputs(**kwargs):
+        raise AssertionError('empty tool_outputs must not be submitted')
+
+    runs = SimpleNamespace(
+        create=lambda **kwargs: stream,
+        submit_tool_outputs=submit_tool_outputs,
+        cancel=lambda thread_id, run_id, timeout: cancelled.append(run_id)
+    )
+    monkeypatch.setattr(functions, 'openai_client', SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(runs=runs))))
+    monkeypatch.setattr(functions, '_post_telegram_message', lambda user_id, message, deadline: 'thread_1')
+    monkeypatch.setattr(functions, 'run_checkpoints', RunCheckpoints(str(tmp_path / 'run_checkpoints.json')))
+    monkeypatch.setattr(functions, 'deadline_stats', {'misses': 0, 'cancelled_runs': 0, 'cancel_failures': 0})
+
+    with pytest.raises(functions.AssistantRunError):
+        functions._stream_openai_assistant_reply(42, 'Вопрос', lambda text: None, functions.Deadline(), {})
+    assert cancelled == ['run_1']
+    assert functions.run_checkpoints.active_count() == 0
+
+
+def test_progressive_reply_keeps_the_keyboard(monkeypatch):
+    sent, edits = [], []
+
+    def send_message(chat_id, text, keyboard=None):
+        sent.append((text, keyboard))
+        return {'ok': True, 'result': {'message_id': len(sent)}}
+
+    def edit_message_text(chat_id, message_id, text):
+        edits.append(text)
+        return {'ok': True}
+
+    monkeypatch.setattr(main, 'send_message', send_message)
+    monkeypatch.setattr(main, 'edit_message_text', edit_message_text)
+    monkeypatch.setattr(main, 'EDIT_INTERVAL', 0)
+    reply = main.ProgressiveReply(1001, main.MAIN_KEYBOARD)
+    reply.update('Клуб открыт')
+    assert reply.finish('Клуб открыт с 7:00 до 23:00')
+    assert sent == [('Клуб открыт', main.MAIN_KEYBOARD)]
+    assert edits == ['Клуб открыт с 7:00 до 23:00']
@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+import tracing
+from tracing import profiler, span, traced
+
+
+@pytest.fixture(autouse=True)
+def clean_traces():
+    tracing.recent_traces.clear()
+    yield
+    tracing.set_tracing(False)
+    tracing.recent_traces.clear()
+
+
+@traced('test-request')
+def handle():
+    with span('openai.runs.create'):
+        time.sleep(0.01)
+    try:
+        with span('sheets.append'):
+            raise ValueError('quota')
+    except ValueError:
+        pass
+    return 'ok'
+
+
+def test_spans_are_collected_into_one_trace():
+    tracing.set_tracing(True)
+    assert handle() == 'ok'
+    trace = tracing.recent_traces[-1]
+    assert trace['name'] == 'test-request'
+    assert [s['name'] for s in trace['spans']] == ['openai.runs.create', 'sheets.append']
+    assert trace['spans'][0]['duration_ms'] >= 10
+    assert trace['spans'][1]['error'] == 'ValueError'
+    assert '_start' not in trace
+
+
+def test_nothing_recorded_when_disabled():
+    assert handle() == 'ok'
+    assert len(tracing.recent_traces) == 0
+
+
+def test_span_outside_request_is_noop():
+    with span('orphan') as current:
+        assert current is not None
+    assert len(tracing.recent_traces) == 0
+
+
+def test_profiler_returns_folded_stacks():
+    assert profiler.start(0.001)
+    assert not profiler.start(0.001)
+    deadline = time.monotonic() + 0.2
+    while time.monotonic() < deadline:
+        sum(range(1000))
+    folded = profiler.stop()
+    assert profiler.samples > 0
+    assert 'test_profiler_returns_folded_stacks' in folded
+    assert profiler.stop() == ''
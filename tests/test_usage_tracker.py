@@ -0,0 +1,59 @@
+import json
+from datetime import date
+from types import SimpleNamespace
+
+from usage_tracker import BUDGET_FALLBACK_MODEL, UsageTracker, build_report, day_log_path
+
+
+def usage(prompt: int, completion: int):
+    return SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion)
+
+
+def test_today_counters_restored_from_day_file(tmp_path):
+    log_file = str(tmp_path / 'usage_log.jsonl')
+    tracker = UsageTracker(log_file, daily_budget=100)
+    tracker.record(42, 'telegram', usage(60, 50), 'gpt-4o', 'run_1')
+    tracker.flush()
+    assert (tmp_path / f'usage_log-{date.today().isoformat()}.jsonl').exists()
+
+    restarted = UsageTracker(log_file, daily_budget=100)
+    assert restarted.tokens_today(42, 'telegram') == 110
+    assert restarted.over_budget(42, 'telegram')
+    assert not restarted.over_budget(42, 'web')
+
+
+def test_key_order_and_formatting_do_not_matter(tmp_path):
+    log_file = str(tmp_path / 'usage_log.jsonl')
+    entry = {'prompt_tokens': 5, 'completion_tokens': 5, 'channel': 'web', 'user_id': 'u1',
+             'day': date.today().isoformat()}
+    with open(day_log_path(log_file, entry['day']), 'w', encoding='utf-8') as f:
+        f.write(json.dumps(entry, indent=None, separators=(',', ':')) + '\n\n')
+    assert UsageTracker(log_file).tokens_today('u1', 'web') == 10
+
+
+def test_missing_usage_is_ignored(tmp_path):
+    tracker = UsageTracker(str(tmp_path / 'usage_log.jsonl'))
+    tracker.record(1, 'web', None)
+    assert tracker.tokens_today(1, 'web') == 0
+
+
+def test_budget_run_options_switch_model_and_trim_context(tmp_path):
+    options = UsageTracker(str(tmp_path / 'usage_log.jsonl')).budget_run_options()
+    assert options['model'] == BUDGET_FALLBACK_MODEL
+    assert options['truncation_strategy']['type'] == 'last_messages'
+
+
+def test_snapshot_and_report(tmp_path):
+    log_file = str(tmp_path / 'usage_log.jsonl')
+    tracker = UsageTracker(log_file, daily_budget=10)
+    tracker.record('u1', 'web', usage(1, 2))
+    tracker.record(7, 'telegram', usage(10, 5))
+    tracker.flush()
+    snapshot = tracker.snapshot()
+    assert snapshot['channels']['telegram']['runs'] == 1
+    assert 'top_users' not in snapshot
+    assert snapshot['users_over_budget'] == 1
+    assert tracker.snapshot(include_users=True)['top_users'][0] == {'channel': 'telegram', 'user_id': '7', 'tokens': 15}
+    report = dict(build_report(log_file, 1, 'channel'))
+    assert report['web']['completion_tokens'] == 2
+    assert report['telegram']['prompt_tokens'] == 10
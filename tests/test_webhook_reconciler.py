@@ -0,0 +1,63 @@
+import pytest
+
+import webhook_reconciler
+from webhook_reconciler import WebhookReconciler
+
+
+class FakeTelegram:
+    def __init__(self, url, pending=0):
+        self.info = {'url': url, 'pending_update_count': pending}
+        self.registered = []
+        self.saved_url = None
+
+    def set_webhook(self, url, bot_token):
+        self.registered.append(url)
+        self.info['url'] = url
+        return True
+
+
+@pytest.fixture
+def telegram(monkeypatch):
+    fake = FakeTelegram('https://old.ngrok.app/')
+    monkeypatch.setattr(webhook_reconciler, 'get_telegram_webhook_info', lambda token: dict(fake.info))
+    monkeypatch.setattr(webhook_reconciler, 'set_telegram_webhook', fake.set_webhook)
+    monkeypatch.setattr(webhook_reconciler, 'get_webhook_url', lambda: fake.saved_url)
+    monkeypatch.setattr(webhook_reconciler, 'save_webhook_url', lambda url: setattr(fake, 'saved_url', url))
+    return fake
+
+
+def test_drift_is_reregistered(telegram, monkeypatch):
+    monkeypatch.setattr(webhook_reconciler, 'get_ngrok_url', lambda: 'https://new.ngrok.app')
+    reconciler = WebhookReconciler('token')
+    assert reconciler.reconcile()
+    assert telegram.registered == ['https://new.ngrok.app/']
+    assert reconciler.snapshot()['reregistrations'] == 1
+    assert 'webhook_url' not in reconciler.snapshot()
+    assert reconciler.snapshot(include_urls=True)['tunnel_url'] == 'https://new.ngrok.app'
+
+    assert reconciler.reconcile()
+    assert telegram.registered == ['https://new.ngrok.app/']
+
+
+def test_backlog_metrics_without_tunnel(telegram, monkeypatch):
+    monkeypatch.setattr(webhook_reconciler, 'get_ngrok_url', lambda: None)
+    telegram.saved_url = 'https://old.ngrok.app'
+    telegram.info.update(pending_update_count=250, last_error_message='Connection refused')
+    reconciler = WebhookReconciler('token')
+    assert reconciler.reconcile()
+    snapshot = reconciler.snapshot()
+    assert snapshot['pending_update_count'] == 250
+    assert snapshot['last_error_message'] == 'Connection refused'
+    assert telegram.registered == []
+
+
+def test_failed_webhook_info_is_counted(telegram, monkeypatch):
+    monkeypatch.setattr(webhook_reconciler, 'get_ngrok_url', lambda: None)
+    monkeypatch.setattr(webhook_reconciler, 'get_telegram_webhook_info', lambda token: None)
+    reconciler = WebhookReconciler('token')
+    assert not reconciler.reconcile()
+    assert reconciler.snapshot()['check_errors'] == 1
+
+
+def test_disabled_without_token():
+    assert not WebhookReconciler('', interval=60).start()
@@ -0,0 +1,146 @@
+import os
+import sys
+import time
+import threading
+import functools
+import logging
+from collections import Counter, deque
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Трассировка включается через TRACING_ENABLED=1 или /debug/traces?enable=1.
+# В выключенном состоянии span() возвращает общий no-op объект.
+tracing_enabled = os.getenv('TRACING_ENABLED', '0') == '1'
+MAX_TRACES = int(os.getenv('TRACING_MAX_TRACES', '100'))
+
+recent_traces = deque(maxlen=MAX_TRACES)
+_local = threading.local()
+
+
+def set_tracing(enabled: bool):
+    global tracing_enabled
+    tracing_enabled = enabled
+    logger.info(f"Tracing {'enabled' if enabled else 'disabled'}")
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    def __init__(self, trace: dict, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace['spans'].append({
+            'name': self.name,
+            'start_ms': round((self.start - self.trace['_start']) * 1000, 1),
+            'duration_ms': round((time.perf_counter() - self.start) * 1000, 1),
+            'error': exc_type.__name__ if exc_type else None
+        })
+        return False
+
+
+def span(name: str):
+    """Замер одного внешнего вызова внутри текущего запроса"""
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, name)
+
+
+def traced(name: str):
+    """Декоратор view-функции: все span() внутри запроса собираются в один трейс"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracing_enabled:
+                return func(*args, **kwargs)
+            trace = {'name': name, 'started_at': time.time(), 'spans': [], '_start': time.perf_counter()}
+            _local.trace = trace
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _local.trace = None
+                trace['duration_ms'] = round((time.perf_counter() - trace.pop('_start')) * 1000, 1)
+                recent_traces.append(trace)
+        return wrapper
+    return decorator
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профайлер: раз в interval секунд снимает стеки всех
+    потоков и считает их. Результат - "folded stacks" (формат
+    flamegraph.pl / speedscope): "frame;frame;frame count" на строку.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = 0.005) -> bool:
+        with self._lock:
+            if self.running:
+                return False
+            self._stacks = Counter()
+            self.samples = 0
+            self.started_at = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, args=(interval,), name="sampling-profiler", daemon=True
+            )
+            self._thread.start()
+        logger.info(f"Sampling profiler started (interval {interval * 1000:.1f} ms)")
+        return True
+
+    def _run(self, interval: float):
+        own_id = threading.get_ident()
+        while not self._stop.wait(interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self._stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self) -> str:
+        """Останавливает профайлер и возвращает folded stacks"""
+        with self._lock:
+            if self._thread is None:
+                return ''
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        logger.info(f"Sampling profiler stopped: {self.samples} samples")
+        return '\n'.join(f"{stack} {count}" for stack, count in self._stacks.most_common())
+
+
+profiler = SamplingProfiler()
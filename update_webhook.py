@@ -1,8 +1,8 @@
-import requests
 import os
 import time
 from dotenv import load_dotenv
 import logging
+from url_manager import get_ngrok_url, save_webhook_url, set_telegram_webhook
 
 # Настройка логирования
 logging.basicConfig(
@@ -11,21 +11,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def get_ngrok_url():
-    """Получает публичный URL ngrok"""
+def wait_for_ngrok_url():
+    """Ждёт появления публичного URL ngrok"""
     max_attempts = 30
     for attempt in range(max_attempts):
-        try:
-            response = requests.get("http://localhost:4040/api/tunnels")
-            if response.status_code == 200:
-                data = response.json()
-                for tunnel in data["tunnels"]:
-                    if tunnel["proto"] == "https":
-                        return tunnel["public_url"]
-            logger.info(f"Попытка получить URL ngrok ({attempt + 1}/{max_attempts})")
-            time.sleep(1)
-        except:
-            time.sleep(1)
+        url = get_ngrok_url()
+        if url:
+            return url
+        logger.info(f"Попытка получить URL ngrok ({attempt + 1}/{max_attempts})")
+        time.sleep(1)
     return None
 
 def main():
@@ -34,22 +28,20 @@ def main():
     telegram_bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
     # Получаем URL ngrok
     logger.info("Получаем URL ngrok...")
-    ngrok_url = get_ngrok_url()
+    ngrok_url = wait_for_ngrok_url()
     if not ngrok_url:
         logger.error("Не удалось получить URL ngrok")
         return False
+    save_webhook_url(ngrok_url)
     # Формируем URL для webhook
     webhook_url = f"{ngrok_url}/"
     logger.info(f"Webhook URL: {webhook_url}")
     # Обновляем webhook
-    telegram_url = f"https://api.telegram.org/bot{telegram_bot_token}/setWebhook"
-    response = requests.post(telegram_url, json={"url": webhook_url})
-    if response.status_code == 200:
+    if set_telegram_webhook(webhook_url, telegram_bot_token):
         logger.info("Webhook успешно обновлен")
         return True
-    else:
-        logger.error(f"Ошибка при обновлении webhook: {response.text}")
-        return False
+    logger.error("Ошибка при обновлении webhook")
+    return False
 
 if __name__ == "__main__":
     main()
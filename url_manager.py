@@ -1,5 +1,6 @@
 import os
 import json
+import threading
 import requests
 import logging
 from typing import Optional
@@ -9,20 +10,52 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 CONFIG_FILE = 'config.json'
+WEBHOOK_URL_FILE = 'webhook_url.txt'
 NGROK_API = 'http://localhost:4040/api/tunnels'
+TELEGRAM_API = 'https://api.telegram.org/bot{token}/{method}'
 
-def get_ngrok_url() -> Optional[str]:
-    """Получает публичный URL от ngrok"""
+# Текущий URL вебхука в памяти: файл читается, только пока URL неизвестен
+_webhook_url = None
+_webhook_url_lock = threading.Lock()
+
+def get_ngrok_url(timeout: float = 2) -> Optional[str]:
+    """Получает публичный HTTPS URL от ngrok"""
     try:
-        response = requests.get(NGROK_API)
+        response = requests.get(NGROK_API, timeout=timeout)
         if response.status_code == 200:
             data = response.json()
             for tunnel in data['tunnels']:
-                if tunnel['proto'] == 'https':
+                if tunnel['public_url'].startswith('https://'):
                     return tunnel['public_url']
         return None
     except Exception as e:
-        logger.error(f"Error getting ngrok URL: {e}")
+        logger.debug(f"Error getting ngrok URL: {e}")
+        return None
+
+def set_telegram_webhook(url: str, bot_token: str) -> bool:
+    """Регистрирует вебхук Telegram (setWebhook)"""
+    try:
+        response = requests.post(
+            TELEGRAM_API.format(token=bot_token, method='setWebhook'),
+            json={'url': url},
+            timeout=10
+        )
+        if response.status_code == 200:
+            return True
+        logger.error(f"Error setting webhook: {response.text}")
+        return False
+    except Exception as e:
+        logger.error(f"Error setting webhook: {e}")
+        return False
+
+def get_telegram_webhook_info(bot_token: str) -> Optional[dict]:
+    """Состояние вебхука по данным Telegram (getWebhookInfo)"""
+    try:
+        response = requests.get(TELEGRAM_API.format(token=bot_token, method='getWebhookInfo'), timeout=10)
+        response.raise_for_status()
+        return response.json()['result']
+    except Exception as e:
+        logger.error(f"Error getting webhook info: {e}")
         return None
 
 def update_config_url(url: str) -> bool:
@@ -48,9 +81,12 @@ def get_config_url() -> Optional[str]:
     return None
 
 def save_webhook_url(url):
-    """Сохраняет URL вебхука в файл"""
+    """Сохраняет URL вебхука в памяти и в файл"""
+    global _webhook_url
+    with _webhook_url_lock:
+        _webhook_url = url
     try:
-        with open('webhook_url.txt', 'w') as f:
+        with open(WEBHOOK_URL_FILE, 'w') as f:
             f.write(url)
         return True
     except Exception as e:
@@ -58,13 +94,16 @@ def save_webhook_url(url):
         return False
 
 def get_webhook_url():
-    """Получает URL вебхука из файла"""
-    try:
-        with open('webhook_url.txt', 'r') as f:
-            return f.read().strip()
-    except Exception as e:
-        logger.error(f"Error reading webhook URL: {e}")
-        return None
+    """Получает URL вебхука (из памяти; файл читается, пока URL неизвестен)"""
+    global _webhook_url
+    with _webhook_url_lock:
+        if _webhook_url is None:
+            try:
+                with open(WEBHOOK_URL_FILE, 'r') as f:
+                    _webhook_url = f.read().strip() or None
+            except Exception as e:
+                logger.error(f"Error reading webhook URL: {e}")
+        return _webhook_url
 
 # Автоматическое обновление URL при запуске скрипта
 if __name__ == '__main__':
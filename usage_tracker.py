@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import argparse
+import threading
+import logging
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+USAGE_LOG_FILE = os.getenv('USAGE_LOG_FILE', 'usage_log.jsonl')
+TENANT_ID = os.getenv('TENANT_ID', 'worldclass')
+# Дневной лимит токенов на пользователя; 0 - без ограничения
+DAILY_USER_TOKEN_BUDGET = int(os.getenv('DAILY_USER_TOKEN_BUDGET', '0'))
+# Дешёвый режим для превысивших лимит: другая модель и короткий контекст
+BUDGET_FALLBACK_MODEL = os.getenv('BUDGET_FALLBACK_MODEL', 'gpt-4o-mini')
+BUDGET_LAST_MESSAGES = int(os.getenv('BUDGET_LAST_MESSAGES', '4'))
+
+FLUSH_INTERVAL = 1.0  # сек между записями буфера на диск
+
+
+def day_log_path(log_file: str, day: str) -> str:
+    """Журнал за день: usage_log.jsonl -> usage_log-2026-10-19.jsonl"""
+    root, ext = os.path.splitext(log_file)
+    return f"{root}-{day}{ext or '.jsonl'}"
+
+
+class UsageTracker:
+    """
+    Учёт токенов по run'ам ассистента.
+    record() только обновляет счётчики в памяти и кладёт запись в очередь;
+    на диск (JSONL, отдельный файл на каждый день) пишет фоновый поток пачками.
+    """
+
+    def __init__(self, log_file: str = USAGE_LOG_FILE, daily_budget: int = DAILY_USER_TOKEN_BUDGET,
+                 tenant: str = TENANT_ID):
+        self.log_file = log_file
+        self.daily_budget = daily_budget
+        self.tenant = tenant
+        self._lock = threading.Lock()
+        self._day = date.today()
+        self._user_tokens = Counter()  # (channel, user_id) -> токенов за сегодня
+        self._channel_totals = defaultdict(Counter)  # channel -> prompt/completion/runs за сегодня
+        self._queue = queue.SimpleQueue()
+        self._writer = None
+        self._load_today()
+
+    def _load_today(self):
+        """
+        Восстанавливает сегодняшние счётчики из журнала (лимиты переживают перезапуск).
+        Читается только файл за сегодня, поэтому старт не замедляется с ростом журнала
+        """
+        path = day_log_path(self.log_file, self._day.isoformat())
+        if not os.path.exists(path):
+            return
+        today = self._day.isoformat()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    if entry.get('day') == today:
+                        self._count(entry)
+        except Exception as e:
+            logger.error(f"Error loading usage log: {e}")
+
+    def _count(self, entry: dict):
+        total = entry['prompt_tokens'] + entry['completion_tokens']
+        self._user_tokens[(entry['channel'], str(entry['user_id']))] += total
+        totals = self._channel_totals[entry['channel']]
+        totals['prompt_tokens'] += entry['prompt_tokens']
+        totals['completion_tokens'] += entry['completion_tokens']
+        totals['runs'] += 1
+
+    def _roll_day(self):
+        today = date.today()
+        if today != self._day:
+            self._day = today
+            self._user_tokens.clear()
+            self._channel_totals.clear()
+
+    def record(self, user_id, channel: str, usage, model: str = None, run_id: str = None):
+        """Учитывает usage завершённого run (объект run.usage или None)"""
+        if usage is None:
+            return
+        entry = {
+            'day': date.today().isoformat(),
+            'ts': round(time.time(), 3),
+            'tenant': self.tenant,
+            'channel': channel,
+            'user_id': str(user_id),
+            'model': model,
+            'run_id': run_id,
+            'prompt_tokens': usage.prompt_tokens or 0,
+            'completion_tokens': usage.completion_tokens or 0
+        }
+        with self._lock:
+            self._roll_day()
+            self._count(entry)
+        self._queue.put(entry)
+        self._ensure_writer()
+
+    def tokens_today(self, user_id, channel: str) -> int:
+        with self._lock:
+            self._roll_day()
+            return self._user_tokens[(channel, str(user_id))]
+
+    def over_budget(self, user_id, channel: str) -> bool:
+        return self.daily_budget > 0 and self.tokens_today(user_id, channel) >= self.daily_budget
+
+    def budget_run_options(self) -> dict:
+        """Параметры runs.create для дешёвого режима"""
+        return {
+            'model': BUDGET_FALLBACK_MODEL,
+            'truncation_strategy': {'type': 'last_messages', 'last_messages': BUDGET_LAST_MESSAGES}
+        }
+
+    def snapshot(self, include_users: bool = False) -> dict:
+        """
+        Сегодняшние итоги для /metrics. Расход по пользователям (chat ID) -
+        только при include_users, для /debug/metrics
+        """
+        with self._lock:
+            self._roll_day()
+            snapshot = {
+                'day': self._day.isoformat(),
+                'tenant': self.tenant,
+                'daily_user_budget': self.daily_budget,
+                'channels': {channel: dict(totals) for channel, totals in self._channel_totals.items()},
+                'users_over_budget': sum(
+                    1 for tokens in self._user_tokens.values()
+                    if self.daily_budget and tokens >= self.daily_budget
+                )
+            }
+            if include_users:
+                snapshot['top_users'] = [
+                    {'channel': channel, 'user_id': user_id, 'tokens': tokens}
+                    for (channel, user_id), tokens in self._user_tokens.most_common(10)
+                ]
+            return snapshot
+
+    # --- запись на диск ---
+
+    def _ensure_writer(self):
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="usage-writer", daemon=True)
+                    self._writer.start()
+                    atexit.register(self.flush)
+
+    def _write_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        lines_by_day = defaultdict(list)
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            lines_by_day[entry['day']].append(json.dumps(entry, ensure_ascii=False))
+        for day, lines in lines_by_day.items():
+            try:
+                with open(day_log_path(self.log_file, day), 'a', encoding='utf-8') as f:
+                    f.write('\n'.join(lines) + '\n')
+            except Exception as e:
+                logger.error(f"Error writing usage log: {e}")
+
+
+usage_tracker = UsageTracker()
+
+
+# ==============================
+# ОТЧЁТ
+# ==============================
+
+def report_files(log_file: str, days: int) -> list:
+    """Дневные журналы за последние days дней"""
+    today = date.today()
+    paths = [day_log_path(log_file, (today - timedelta(days=offset)).isoformat()) for offset in range(days)]
+    return [path for path in paths if os.path.exists(path)]
+
+
+def _iter_entries(paths: list):
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def build_report(log_file: str, days: int, group_by: str) -> list:
+    """Суммы токенов из журнала за последние days дней, сгруппированные по group_by"""
+    since = (date.today() - timedelta(days=days - 1)).isoformat()
+    groups = defaultdict(Counter)
+    for entry in _iter_entries(report_files(log_file, days)):
+        if entry['day'] < since:
+            continue
+        if group_by == 'user':
+            key = f"{entry['channel']}:{entry['user_id']}"
+        else:
+            key = entry[group_by]
+        totals = groups[key or '—']
+        totals['runs'] += 1
+        totals['prompt_tokens'] += entry['prompt_tokens']
+        totals['completion_tokens'] += entry['completion_tokens']
+    return sorted(
+        groups.items(),
+        key=lambda item: item[1]['prompt_tokens'] + item[1]['completion_tokens'],
+        reverse=True
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Отчёт по расходу токенов OpenAI")
+    parser.add_argument('--days', type=int, default=1)
+    parser.add_argument('--by', choices=['user', 'channel', 'tenant', 'day', 'model'], default='user')
+    parser.add_argument('--log', default=USAGE_LOG_FILE)
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    if not report_files(args.log, args.days):
+        print(f"Журнал {args.log} за {args.days} дн. не найден")
+        return 1
+    print(f"Расход токенов за {args.days} дн. (по {datetime.now():%Y-%m-%d %H:%M})")
+    print(f"{args.by:<40} {'runs':>6} {'prompt':>10} {'completion':>11} {'total':>10}")
+    for key, totals in build_report(args.log, args.days, args.by)[:args.top]:
+        total = totals['prompt_tokens'] + totals['completion_tokens']
+        print(f"{key:<40} {totals['runs']:>6} {totals['prompt_tokens']:>10} "
+              f"{totals['completion_tokens']:>11} {total:>10}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import os
+import time
+import threading
+import logging
+from dotenv import load_dotenv
+from url_manager import get_ngrok_url, get_webhook_url, save_webhook_url, set_telegram_webhook, \
+    get_telegram_webhook_info
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Проверка туннеля и getWebhookInfo раз в WEBHOOK_RECONCILE_INTERVAL сек; 0 - отключено
+WEBHOOK_RECONCILE_INTERVAL = float(os.getenv('WEBHOOK_RECONCILE_INTERVAL', '60'))
+# Предупреждение в лог, если в Telegram скопилось больше обновлений
+WEBHOOK_BACKLOG_WARN = int(os.getenv('WEBHOOK_BACKLOG_WARN', '100'))
+
+
+def _same_url(first: str, second: str) -> bool:
+    return (first or '').rstrip('/') == (second or '').rstrip('/')
+
+
+class WebhookReconciler:
+    """
+    Фоновая сверка вебхука: текущий URL туннеля ngrok сравнивается с тем,
+    что Telegram считает вебхуком (getWebhookInfo). При расхождении или
+    пропаже вебхука он регистрируется заново. Заодно снимаются метрики
+    очереди Telegram: pending_update_count и последняя ошибка доставки.
+    """
+
+    def __init__(self, bot_token: str, interval: float = WEBHOOK_RECONCILE_INTERVAL):
+        self.bot_token = bot_token
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {
+            'checks': 0,
+            'check_errors': 0,
+            'reregistrations': 0,
+            'tunnel_url': None,
+            'webhook_url': None,
+            'pending_update_count': None,
+            'last_error_date': None,
+            'last_error_message': None,
+            'last_check': None
+        }
+
+    def reconcile(self) -> bool:
+        """Одна сверка; True - вебхук совпадает с ожидаемым (или перерегистрирован)"""
+        tunnel_url = get_ngrok_url()
+        if tunnel_url and tunnel_url != get_webhook_url():
+            logger.info(f"Tunnel URL changed: {tunnel_url}")
+            save_webhook_url(tunnel_url)
+        # Без ngrok (постоянный адрес) ожидаемым считается сохранённый URL
+        expected_url = tunnel_url or get_webhook_url()
+
+        info = get_telegram_webhook_info(self.bot_token)
+        with self._lock:
+            self.stats['checks'] += 1
+            self.stats['last_check'] = round(time.time(), 3)
+            self.stats['tunnel_url'] = tunnel_url
+            if info is None:
+                self.stats['check_errors'] += 1
+                return False
+            self.stats['webhook_url'] = info.get('url') or None
+            self.stats['pending_update_count'] = info.get('pending_update_count', 0)
+            self.stats['last_error_date'] = info.get('last_error_date')
+            self.stats['last_error_message'] = info.get('last_error_message')
+        pending = info.get('pending_update_count', 0)
+        if pending > WEBHOOK_BACKLOG_WARN:
+            logger.warning(f"Telegram backlog: {pending} pending updates "
+                           f"(last error: {info.get('last_error_message')})")
+
+        if not expected_url or _same_url(info.get('url'), expected_url):
+            return True
+        logger.warning(f"Webhook drift: Telegram has {info.get('url') or 'no webhook'}, "
+                       f"expected {expected_url}; re-registering")
+        if not set_telegram_webhook(f"{expected_url.rstrip('/')}/", self.bot_token):
+            return False
+        with self._lock:
+            self.stats['reregistrations'] += 1
+            self.stats['webhook_url'] = f"{expected_url.rstrip('/')}/"
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.reconcile()
+            except Exception as e:
+                logger.error(f"Webhook reconcile error: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self) -> bool:
+        if self.interval <= 0 or not self.bot_token:
+            return False
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="webhook-reconciler", daemon=True)
+            self._thread.start()
+            logger.info(f"Webhook reconciler started (every {self.interval:.0f} sec)")
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self, include_urls: bool = False) -> dict:
+        """Метрики сверки; адреса туннеля и вебхука - только при include_urls (/debug/metrics)"""
+        with self._lock:
+            stats = dict(self.stats)
+        if not include_urls:
+            stats.pop('tunnel_url')
+            stats.pop('webhook_url')
+        return {'enabled': self._thread is not None, **stats}